@@ -0,0 +1,52 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+Databases created by the old create_all on startup already match this revision: run `alembic stamp 0001` once.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("email_verified", sa.Boolean(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+    )
+    op.create_index("ix_user_username", "user", ["username"], unique=True)
+    op.create_index("ix_user_email", "user", ["email"], unique=True)
+
+    op.create_table(
+        "shipment",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("product", sa.String(), nullable=False),
+        sa.Column("progress", sa.Enum("PLACED", "IN_TRANSIT", "SHIPPED", name="progressstatus"), nullable=False),
+        sa.Column("estimated_delivery", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("approval_status", sa.Enum("PENDING", "ACCEPTED", "REJECTED", name="approvalstatus"), nullable=False),
+        sa.Column("buyer_id", sa.Uuid(), sa.ForeignKey("user.id"), nullable=False),
+        sa.Column("seller_id", sa.Uuid(), sa.ForeignKey("user.id"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("shipment")
+    op.drop_index("ix_user_email", table_name="user")
+    op.drop_index("ix_user_username", table_name="user")
+    op.drop_table("user")
+    sa.Enum(name="approvalstatus").drop(op.get_bind())
+    sa.Enum(name="progressstatus").drop(op.get_bind())
@@ -0,0 +1,117 @@
+"""change feed, tombstones, outbox, notification mode and shipment indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+from uuid import UUID
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10_000
+
+SHIPMENT_INDEXES = {
+    "ix_shipment_estimated_delivery_id": ["estimated_delivery", "id"],
+    "ix_shipment_progress_estimated_delivery_id": ["progress", "estimated_delivery", "id"],
+    "ix_shipment_approval_status_estimated_delivery_id": ["approval_status", "estimated_delivery", "id"],
+    "ix_shipment_buyer_id_estimated_delivery_id": ["buyer_id", "estimated_delivery", "id"],
+    "ix_shipment_seller_id_estimated_delivery_id": ["seller_id", "estimated_delivery", "id"],
+    "ix_shipment_change_txid_id": ["change_txid", "id"],
+}
+
+
+def upgrade() -> None:
+    notification_mode = postgresql.ENUM("INSTANT", "DIGEST", name="notificationmode")
+    notification_mode.create(op.get_bind())
+    # A constant default is stored in the catalog, existing rows are not rewritten
+    op.add_column(
+        "user",
+        sa.Column("notification_mode", notification_mode, nullable=False, server_default="INSTANT")
+    )
+
+    op.create_table(
+        "shipment_tombstone",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("buyer_id", sa.Uuid(), nullable=False),
+        sa.Column("seller_id", sa.Uuid(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("change_txid", sa.BigInteger(), server_default=sa.text("txid_current()"), nullable=False),
+    )
+    op.create_index("ix_shipment_tombstone_change_txid_id", "shipment_tombstone", ["change_txid", "id"])
+
+    op.create_table(
+        "outbox_event",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("payload", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_outbox_event_unsent_id", "outbox_event", ["id"], postgresql_where=sa.text("sent_at IS NULL"))
+    op.create_index("ix_outbox_event_sent_at", "outbox_event", ["sent_at"])
+
+    # txid_current() is volatile, as an ADD COLUMN default it would rewrite the table under an exclusive lock.
+    # The column is added empty and committed right away, so the ACCESS EXCLUSIVE lock is only held briefly.
+    op.add_column("shipment", sa.Column("change_txid", sa.BigInteger(), nullable=True))
+    op.alter_column("shipment", "change_txid", server_default=sa.text("txid_current()"))
+
+    # Every statement below commits on its own, so none of them holds a lock on shipment for long
+    with op.get_context().autocommit_block():
+        _backfill_change_txid()
+
+        # VALIDATE only takes a SHARE UPDATE EXCLUSIVE lock, and SET NOT NULL then relies on the
+        # validated check instead of scanning the table again
+        op.execute(
+            "ALTER TABLE shipment ADD CONSTRAINT shipment_change_txid_not_null "
+            "CHECK (change_txid IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE shipment VALIDATE CONSTRAINT shipment_change_txid_not_null")
+        op.alter_column("shipment", "change_txid", nullable=False)
+        op.drop_constraint("shipment_change_txid_not_null", "shipment", type_="check")
+
+        # Built without blocking writes to shipment. CONCURRENTLY cannot run inside a transaction;
+        # if_not_exists lets a rerun continue after an interrupted build (drop any index left INVALID first).
+        for name, columns in SHIPMENT_INDEXES.items():
+            op.create_index(name, "shipment", columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def _backfill_change_txid() -> None:
+    if context.is_offline_mode():
+        op.execute("UPDATE shipment SET change_txid = txid_current() WHERE change_txid IS NULL")
+        return
+    # Walks the primary key in batches, each UPDATE is its own short transaction
+    bind = op.get_bind()
+    after = UUID(int=0)
+    while True:
+        ids = bind.execute(sa.text(
+            "UPDATE shipment SET change_txid = txid_current() WHERE id IN ("
+            "SELECT id FROM shipment WHERE change_txid IS NULL AND id > :after "
+            "ORDER BY id LIMIT :batch_size) RETURNING id"
+        ), {"after": after, "batch_size": BACKFILL_BATCH_SIZE}).scalars().all()
+        if not ids:
+            return
+        after = max(ids)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in SHIPMENT_INDEXES:
+            op.drop_index(name, table_name="shipment", postgresql_concurrently=True, if_exists=True)
+
+    op.drop_index("ix_outbox_event_sent_at", table_name="outbox_event")
+    op.drop_index("ix_outbox_event_unsent_id", table_name="outbox_event")
+    op.drop_table("outbox_event")
+    op.drop_index("ix_shipment_tombstone_change_txid_id", table_name="shipment_tombstone")
+    op.drop_table("shipment_tombstone")
+    op.drop_column("shipment", "change_txid")
+    op.drop_column("user", "notification_mode")
+    postgresql.ENUM(name="notificationmode").drop(op.get_bind())
@@ -0,0 +1,52 @@
+"""outbox retry backoff and parking
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Neither default is volatile, existing rows are not rewritten
+    op.add_column("outbox_event", sa.Column("attempts", sa.Integer(), server_default=sa.text("0"), nullable=False))
+    op.add_column(
+        "outbox_event",
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
+    )
+    op.add_column("outbox_event", sa.Column("parked_at", sa.DateTime(timezone=True), nullable=True))
+
+    # The relay polls this table constantly, so the pending index is swapped without blocking it
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_outbox_event_pending_id", "outbox_event", ["id"],
+            postgresql_where=sa.text("sent_at IS NULL AND parked_at IS NULL"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.drop_index(
+            "ix_outbox_event_unsent_id", table_name="outbox_event", postgresql_concurrently=True, if_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_outbox_event_unsent_id", "outbox_event", ["id"], postgresql_where=sa.text("sent_at IS NULL"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.drop_index(
+            "ix_outbox_event_pending_id", table_name="outbox_event", postgresql_concurrently=True, if_exists=True
+        )
+
+    op.drop_column("outbox_event", "parked_at")
+    op.drop_column("outbox_event", "next_attempt_at")
+    op.drop_column("outbox_event", "attempts")
@@ -1,7 +1,12 @@
 from celery import Celery
+from celery.signals import celeryd_init
 from dotenv import load_dotenv
+from kombu import Queue
 load_dotenv()
-from ..config import redis_settings
+from ..config import redis_settings, email_notification_settings, celery_settings
+
+TRANSACTIONAL_QUEUE = "transactional"
+NOTIFICATION_QUEUE = "notification"
 
 app = Celery(
     "fastship_worker",
@@ -15,6 +20,42 @@ app.conf.update(
     accept_content=["json"],
     timezone="UTC",
     enable_utc=True,
+    # Every task is fire-and-forget, nothing ever reads a result
+    task_ignore_result=True,
+    task_queues=(Queue(TRANSACTIONAL_QUEUE), Queue(NOTIFICATION_QUEUE)),
+    task_default_queue=NOTIFICATION_QUEUE,
+    task_routes={
+        "send_verification_email_task": {"queue": TRANSACTIONAL_QUEUE},
+        "send_password_reset_email": {"queue": TRANSACTIONAL_QUEUE},
+        "send_shipment_created_email": {"queue": NOTIFICATION_QUEUE},
+        "send_modified_approval_email": {"queue": NOTIFICATION_QUEUE},
+        "send_email_batch": {"queue": NOTIFICATION_QUEUE},
+        "send_notification_digests": {"queue": NOTIFICATION_QUEUE},
+    },
+    # A worker consuming both queues always drains the transactional one first
+    broker_transport_options={"queue_order_strategy": "priority"},
+    beat_schedule={
+        "send-notification-digests": {
+            "task": "send_notification_digests",
+            "schedule": email_notification_settings.NOTIFICATION_DIGEST_INTERVAL_SECONDS,
+        },
+    },
 )
 
+
+@celeryd_init.connect
+def _configure_for_queues(conf, options, **kwargs) -> None:
+    # Prefetch and acks are per worker, so they follow the queues the worker was started with (-Q).
+    # Any worker that serves transactional mail gets the low latency settings.
+    queues = options.get("queues") or [TRANSACTIONAL_QUEUE, NOTIFICATION_QUEUE]
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    if TRANSACTIONAL_QUEUE in queues:
+        conf.worker_prefetch_multiplier = celery_settings.CELERY_TRANSACTIONAL_PREFETCH_MULTIPLIER
+        conf.task_acks_late = celery_settings.CELERY_TRANSACTIONAL_ACKS_LATE
+    else:
+        conf.worker_prefetch_multiplier = celery_settings.CELERY_NOTIFICATION_PREFETCH_MULTIPLIER
+        conf.task_acks_late = celery_settings.CELERY_NOTIFICATION_ACKS_LATE
+
+
 app.autodiscover_tasks(['project1.celery_module.worker'])
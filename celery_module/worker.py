@@ -1,61 +1,188 @@
 import asyncio
+from typing import Any, Awaitable, Callable, Coroutine, TypeVar
+
+from redis import asyncio as aioredis
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from celery.utils.log import get_task_logger
 
 from .app import app
+from ..config import celery_settings, email_notification_settings, redis_settings
 from ..database.schemas.shipment import ShipmentSummary
-from ..services.email_service import email_service
+from ..services.email_service import email_service, precompile_templates
 from ..database.schemas.user import UserBase
+from ..services.digest_buffer import DigestBuffer
 
-@app.task(name="send_verification_email_task")
-def send_verification_email_task(user_data: dict, token: str):
-    user = UserBase(**user_data)
+T = TypeVar("T")
 
-    try:
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(email_service.send_verification_email(user, token))
-    except RuntimeError:
-        asyncio.run(email_service.send_verification_email(user, token))
+logger = get_task_logger(__name__)
 
-    return f"Verification email sent to {user.email}"
+_loop: asyncio.AbstractEventLoop | None = None
+_redis: aioredis.Redis | None = None
 
+DIGEST_USERS_PER_ROUND = 100
 
-@app.task(name="send_password_reset_email")
-def send_password_reset_email_task(user_data: dict, token: str):
-    user = UserBase(**user_data)
 
-    try:
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(email_service.send_password_reset_email(user, token))
-    except RuntimeError:
-        asyncio.run(email_service.send_password_reset_email(user, token))
+@worker_init.connect
+def _precompile_email_templates(**kwargs) -> None:
+    # Runs in the parent before the pool forks, so every child starts with the compiled templates in memory
+    precompile_templates()
 
-    return f"Password reset email sent to {user.email}"
 
+@worker_process_init.connect
+def _start_event_loop(**kwargs) -> None:
+    _get_event_loop()
 
-@app.task(name="send_shipment_created_email")
-def send_shipment_created_email_task(shipment_data: dict, seller_data: dict, buyer_data: dict):
-    shipment = ShipmentSummary(**shipment_data)
-    seller = UserBase(**seller_data)
-    buyer = UserBase(**buyer_data)
 
-    try:
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(email_service.send_shipment_created_email(shipment, seller, buyer))
-    except RuntimeError:
-        asyncio.run(email_service.send_shipment_created_email(shipment, seller, buyer))
+@worker_process_shutdown.connect
+def _stop_event_loop(**kwargs) -> None:
+    global _loop, _redis
+    if _loop is None or _loop.is_closed():
+        return
+    _loop.run_until_complete(email_service.manager.close())
+    if _redis is not None:
+        _loop.run_until_complete(_redis.aclose())
+        _redis = None
+    pending = asyncio.all_tasks(_loop)
+    for task in pending:
+        task.cancel()
+    _loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    _loop.run_until_complete(_loop.shutdown_asyncgens())
+    _loop.close()
+    _loop = None
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    # One loop lives for the whole worker process, so clients bound to it are reused between tasks.
+    # The solo pool never sends worker_process_init, there the loop is created by the first task.
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_async(coroutine: Coroutine[Any, Any, T]) -> T:
+    return _get_event_loop().run_until_complete(coroutine)
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(redis_settings.REDIS_URL(), encoding="utf-8", decode_responses=True)
+    return _redis
+
+
+def _verification_email(user_data: dict, token: str) -> Awaitable[None]:
+    return email_service.send_verification_email(UserBase(**user_data), token)
+
+
+def _password_reset_email(user_data: dict, token: str) -> Awaitable[None]:
+    return email_service.send_password_reset_email(UserBase(**user_data), token)
+
+
+def _shipment_created_email(shipment_data: dict, seller_data: dict, buyer_data: dict,
+                            notify_seller: bool = True, notify_buyer: bool = True) -> Awaitable[None]:
+    return email_service.send_shipment_created_email(
+        ShipmentSummary(**shipment_data), UserBase(**seller_data), UserBase(**buyer_data), notify_seller, notify_buyer
+    )
+
 
-    return f"Shipment created email sent to {buyer.email}"
+def _modified_approval_email(shipment_data: dict, seller_data: dict, buyer_data: dict,
+                             notify_seller: bool = True, notify_buyer: bool = True) -> Awaitable[None]:
+    return email_service.send_modified_approval_email(
+        ShipmentSummary(**shipment_data), UserBase(**seller_data), UserBase(**buyer_data), notify_seller, notify_buyer
+    )
+
+
+def _digest_email(recipient_data: dict, events: list[dict], total: int) -> Awaitable[None]:
+    return email_service.send_digest_email(UserBase(**recipient_data), events, total)
+
+
+def _shipment_updates_email(recipient_data: dict, events: list[dict]) -> Awaitable[None]:
+    return email_service.send_shipment_updates_email(UserBase(**recipient_data), events)
+
+
+EMAIL_JOBS: dict[str, Callable[..., Awaitable[None]]] = {
+    "verification": _verification_email,
+    "password_reset": _password_reset_email,
+    "shipment_created": _shipment_created_email,
+    "modified_approval": _modified_approval_email,
+    "digest": _digest_email,
+    "shipment_updates": _shipment_updates_email,
+}
+
+
+def email_job(kind: str, *args: Any) -> dict:
+    return {"kind": kind, "args": list(args)}
+
+
+@app.task(name="send_verification_email_task")
+def send_verification_email_task(user_data: dict, token: str):
+    run_async(_verification_email(user_data, token))
+    return f"Verification email sent to {user_data['email']}"
+
+
+@app.task(name="send_password_reset_email")
+def send_password_reset_email_task(user_data: dict, token: str):
+    run_async(_password_reset_email(user_data, token))
+    return f"Password reset email sent to {user_data['email']}"
+
+
+@app.task(name="send_shipment_created_email")
+def send_shipment_created_email_task(shipment_data: dict, seller_data: dict, buyer_data: dict,
+                                     notify_seller: bool = True, notify_buyer: bool = True):
+    run_async(_shipment_created_email(shipment_data, seller_data, buyer_data, notify_seller, notify_buyer))
+    return f"Shipment created email sent for {shipment_data['id']}"
 
 
 @app.task(name="send_modified_approval_email")
-def send_modified_approval_email_task(shipment_data: dict, seller_data: dict, buyer_data: dict):
-    shipment = ShipmentSummary(**shipment_data)
-    seller = UserBase(**seller_data)
-    buyer = UserBase(**buyer_data)
-
-    try:
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(email_service.send_modified_approval_email(shipment, seller, buyer))
-    except RuntimeError:
-        asyncio.run(email_service.send_modified_approval_email(shipment, seller, buyer))
-
-    return f"Modified approval email sent to {seller.email} and {buyer.email}"
\ No newline at end of file
+def send_modified_approval_email_task(shipment_data: dict, seller_data: dict, buyer_data: dict,
+                                      notify_seller: bool = True, notify_buyer: bool = True):
+    run_async(_modified_approval_email(shipment_data, seller_data, buyer_data, notify_seller, notify_buyer))
+    return f"Modified approval email sent for {shipment_data['id']}"
+
+
+async def _send_email_batch(jobs: list[dict]) -> list[dict]:
+    semaphore = asyncio.Semaphore(celery_settings.CELERY_EMAIL_CONCURRENCY)
+
+    async def send(job: dict) -> None:
+        async with semaphore:
+            await EMAIL_JOBS[job["kind"]](*job["args"])
+
+    results = await asyncio.gather(*(send(job) for job in jobs), return_exceptions=True)
+    failed = []
+    for job, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.warning("Sending %s email failed: %r", job["kind"], result)
+            failed.append(job)
+    return failed
+
+
+@app.task(name="send_email_batch", bind=True, max_retries=celery_settings.CELERY_EMAIL_BATCH_MAX_RETRIES)
+def send_email_batch_task(self, jobs: list[dict]):
+    failed = run_async(_send_email_batch(jobs))
+    if failed:
+        # Only the failed sends are retried, the rest of the batch is already delivered
+        raise self.retry(args=[failed], countdown=2 ** self.request.retries * 10)
+    return f"Sent {len(jobs)} emails"
+
+
+async def _send_notification_digests() -> int:
+    digest_buffer = DigestBuffer(_get_redis())
+    sent = 0
+    while user_ids := await digest_buffer.pop_pending_users(DIGEST_USERS_PER_ROUND):
+        jobs = []
+        for user_id in user_ids:
+            events, total = await digest_buffer.drain(user_id, email_notification_settings.NOTIFICATION_DIGEST_MAX_EVENTS)
+            if events:
+                jobs.append(email_job("digest", events[-1]["recipient"], events, total))
+        failed = await _send_email_batch(jobs)
+        if failed:
+            send_email_batch_task.delay(failed)
+        sent += len(jobs)
+    return sent
+
+
+@app.task(name="send_notification_digests")
+def send_notification_digests_task():
+    return f"Sent {run_async(_send_notification_digests())} digest emails"
@@ -12,6 +12,20 @@ class DatabaseSettings(BaseSettings):
     POSTGRES_SERVER: str
     POSTGRES_PORT: int
     DB_NAME: str
+    # Per worker process: (DB_POOL_SIZE + DB_MAX_OVERFLOW) * workers has to stay below Postgres max_connections
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Set to 0 behind PgBouncer in transaction mode, prepared statements do not survive a server switch
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Comma separated SQLAlchemy URLs of streaming replicas serving read-only routes, empty sends everything to the primary
+    POSTGRES_REPLICA_URLS: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_HEALTH_CHECK_INTERVAL: float = 5
+    # After a write, the user's reads stay on the primary this long so they always see their own changes
+    READ_YOUR_WRITES_SECONDS: int = 10
 
     model_config = _base_config
 
@@ -19,9 +33,20 @@ class DatabaseSettings(BaseSettings):
     def POSTGRES_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USERNAME}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.DB_NAME}"
 
+    @property
+    def REPLICA_URLS(self) -> list[str]:
+        return [url.strip() for url in self.POSTGRES_REPLICA_URLS.split(",") if url.strip()]
+
 class SecuritySettings(BaseSettings):
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
+    STATELESS_AUTH: bool = True
+    TOKEN_CACHE_SIZE: int = 10000
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    REFRESH_TOKEN_TTL_DAYS: int = 14
+    REFRESH_COOKIE_SECURE: bool = False
 
     model_config = _base_config
 
@@ -35,6 +60,23 @@ class RedisSettings(BaseSettings):
     def REDIS_URL(self, db: int | None = None) -> str:
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{db if db is not None else self.REDIS_DB}"
 
+class SocketSettings(BaseSettings):
+    # "redis" fans messages out to every worker through pub/sub, "local" only reaches sockets of this process
+    SOCKET_BACKEND: str = "redis"
+    SOCKET_SEND_QUEUE_SIZE: int = 64
+    # "drop_oldest" discards the oldest queued message of a slow client, "disconnect" closes its socket
+    SOCKET_OVERFLOW_POLICY: str = "drop_oldest"
+    SOCKET_MAX_CONNECTIONS_PER_USER: int = 5
+    # Sockets quiet for SOCKET_PING_INTERVAL seconds get a PING frame, after SOCKET_IDLE_TIMEOUT they are closed.
+    # Transport-level ping/pong is handled by uvicorn (--ws-ping-interval / --ws-ping-timeout), ASGI cannot send it.
+    SOCKET_PING_INTERVAL: float = 20
+    SOCKET_IDLE_TIMEOUT: float = 60
+    SOCKET_INBOX_MAX_LENGTH: int = 500
+    SOCKET_INBOX_TTL_SECONDS: int = 7 * 24 * 60 * 60
+    SOCKET_REPLAY_LIMIT: int = 200
+
+    model_config = _base_config
+
 class EmailNotificationSettings(BaseSettings):
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -46,6 +88,41 @@ class EmailNotificationSettings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    MAIL_TIMEOUT: float = 60
+    SMTP_POOL_SIZE: int = 4
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    # Pooled sessions idle for SMTP_KEEPALIVE_INTERVAL seconds are probed with NOOP before reuse,
+    # after SMTP_IDLE_TIMEOUT they are assumed dropped by the server and replaced
+    SMTP_KEEPALIVE_INTERVAL: float = 30
+    SMTP_IDLE_TIMEOUT: float = 240
+    # Users in digest mode get one summary email per window instead of one email per shipment event
+    NOTIFICATION_DIGEST_INTERVAL_SECONDS: int = 60 * 60
+    NOTIFICATION_DIGEST_MAX_EVENTS: int = 50
+    # Compiled email templates, shared by all workers on a host. None uses a per-user directory in the system temp dir
+    EMAIL_TEMPLATE_CACHE_DIR: str | None = None
+
+    model_config = _base_config
+
+class CelerySettings(BaseSettings):
+    # Sends a single worker process keeps in flight when working through an email batch
+    CELERY_EMAIL_CONCURRENCY: int = 20
+    CELERY_EMAIL_BATCH_MAX_RETRIES: int = 3
+    # Transactional mail (verification, password reset) is prefetched one at a time so it never waits
+    # behind a reserved backlog. Late acks re-deliver it if a worker dies mid-send, a duplicate is harmless there.
+    CELERY_TRANSACTIONAL_PREFETCH_MULTIPLIER: int = 1
+    CELERY_TRANSACTIONAL_ACKS_LATE: bool = True
+    CELERY_NOTIFICATION_PREFETCH_MULTIPLIER: int = 8
+    CELERY_NOTIFICATION_ACKS_LATE: bool = False
+
+    model_config = _base_config
+
+class OutboxSettings(BaseSettings):
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_INTERVAL: float = 1
+    OUTBOX_RETENTION_HOURS: int = 24
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_RETRY_BASE_SECONDS: float = 5
+    OUTBOX_RETRY_MAX_SECONDS: float = 600
 
     model_config = _base_config
 
@@ -59,5 +136,8 @@ class AppSettings(BaseSettings):
 db_settings = DatabaseSettings()
 security_settings = SecuritySettings()
 redis_settings = RedisSettings()
+socket_settings = SocketSettings()
 email_notification_settings = EmailNotificationSettings()
+celery_settings = CelerySettings()
+outbox_settings = OutboxSettings()
 app_settings = AppSettings()
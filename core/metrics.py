@@ -0,0 +1,16 @@
+from typing import Any, Callable
+
+MetricsCollector = Callable[[], dict[str, Any]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.collectors: dict[str, MetricsCollector] = {}
+
+    def register(self, name: str, collector: MetricsCollector) -> None:
+        self.collectors[name] = collector
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {name: collector() for name, collector in self.collectors.items()}
+
+metrics = MetricsRegistry()
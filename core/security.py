@@ -1,8 +1,77 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from fastapi import status
 from fastapi.security import OAuth2PasswordBearer
+from passlib.context import CryptContext
+
+from ..config import security_settings
+from ..utils.exceptions import AppException
+from ..utils.errors import ErrorCode
+from .metrics import metrics
+
+T = TypeVar("T")
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/token",
 )
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, max_pending: int):
+        # Hashes outside the configured cost are reported by verify_and_update and get rehashed
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        # bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise AppException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                code=ErrorCode.AUTH_BUSY,
+                message="Too many authentication requests in progress, please try again"
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+password_hasher = PasswordHasher(
+    security_settings.BCRYPT_ROUNDS,
+    security_settings.PASSWORD_HASH_WORKERS,
+    security_settings.PASSWORD_HASH_MAX_PENDING,
+)
+metrics.register("password_hasher", password_hasher.stats)
 '''
 class AccessTokenBearer(HTTPBearer):
     async def __call__(self, request):
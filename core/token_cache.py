@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any
+
+from ..config import security_settings
+from .metrics import metrics
+
+
+# Per-process LRU of access tokens that already passed the signature and blacklist checks
+class VerifiedTokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+        self.keys_by_jti: dict[str, str] = {}
+        # Latest token generation seen per user; only users that ever revoked all sessions appear here
+        self.generations: dict[str, int] = {}
+        # Incremented on every revocation so a check that raced with one is never cached
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        data = self.entries.get(key)
+        if data is None or data["exp"] <= time.time() or self._stale_generation(data):
+            if data is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, token: str, data: dict, epoch: int) -> None:
+        if self.max_size <= 0 or epoch != self.epoch:
+            return
+        key = self._key(token)
+        self.entries[key] = data
+        self.entries.move_to_end(key)
+        self.keys_by_jti[data["jti"]] = key
+        while len(self.entries) > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.keys_by_jti.pop(evicted["jti"], None)
+
+    def evict_jti(self, jti: str) -> None:
+        self.epoch += 1
+        key = self.keys_by_jti.pop(jti, None)
+        if key is not None:
+            self.entries.pop(key, None)
+
+    def set_generation(self, user_id: str, generation: int) -> None:
+        if generation > self.generations.get(user_id, 0):
+            self.epoch += 1
+            self.generations[user_id] = generation
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self.entries.clear()
+        self.keys_by_jti.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "tracked_generations": len(self.generations),
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _stale_generation(self, data: dict) -> bool:
+        return data.get("gen", 0) < self.generations.get(data["user"]["id"], 0)
+
+    def _remove(self, key: str) -> None:
+        data = self.entries.pop(key, None)
+        if data is not None:
+            self.keys_by_jti.pop(data["jti"], None)
+
+token_cache = VerifiedTokenCache(security_settings.TOKEN_CACHE_SIZE)
+metrics.register("token_cache", token_cache.stats)
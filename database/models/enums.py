@@ -8,4 +8,7 @@ class ProgressStatus(str, Enum):
 class ApprovalStatus(str, Enum):
     PENDING = "pending"
     ACCEPTED = "accepted"
-    REJECTED = "rejected"
\ No newline at end of file
+    REJECTED = "rejected"
+class NotificationMode(str, Enum):
+    INSTANT = "instant"
+    DIGEST = "digest"
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import BigInteger, Column, DateTime, Identity, Index, Integer, String, func, text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Field, SQLModel
+
+class OutboxEvent(SQLModel, table=True):
+    __tablename__ = "outbox_event"
+    __table_args__ = (
+        Index("ix_outbox_event_pending_id", "id", postgresql_where=text("sent_at IS NULL AND parked_at IS NULL")),
+        Index("ix_outbox_event_sent_at", "sent_at"),
+    )
+
+    id: int | None = Field(
+        default=None,
+        sa_column=Column(BigInteger, Identity(), primary_key=True)
+    )
+    event_type: str = Field(sa_column=Column(String, nullable=False))
+    payload: dict[str, Any] = Field(sa_column=Column(postgresql.JSONB, nullable=False))
+    created_at: datetime | None = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    )
+    sent_at: datetime | None = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    attempts: int = Field(
+        default=0,
+        sa_column=Column(Integer, server_default=text("0"), nullable=False)
+    )
+    next_attempt_at: datetime | None = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    )
+    # Set once an event has failed OUTBOX_MAX_ATTEMPTS times, the relay leaves it alone from then on
+    parked_at: datetime | None = Field(
+        default=None,
+        sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
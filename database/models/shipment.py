@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 from uuid import UUID
 
-from sqlalchemy import Column, DateTime
+from sqlalchemy import BigInteger, Column, DateTime, Index, func, text
 from sqlalchemy.dialects import postgresql
 from sqlmodel import Field, Relationship, SQLModel
 
@@ -14,6 +14,14 @@ if TYPE_CHECKING:
 
 class Shipment(SQLModel, table=True):
     __tablename__ = "shipment"
+    __table_args__ = (
+        Index("ix_shipment_estimated_delivery_id", "estimated_delivery", "id"),
+        Index("ix_shipment_progress_estimated_delivery_id", "progress", "estimated_delivery", "id"),
+        Index("ix_shipment_approval_status_estimated_delivery_id", "approval_status", "estimated_delivery", "id"),
+        Index("ix_shipment_buyer_id_estimated_delivery_id", "buyer_id", "estimated_delivery", "id"),
+        Index("ix_shipment_seller_id_estimated_delivery_id", "seller_id", "estimated_delivery", "id"),
+        Index("ix_shipment_change_txid_id", "change_txid", "id"),
+    )
 
     id: UUID = Field(
         default_factory=uuid.uuid4,
@@ -29,6 +37,12 @@ class Shipment(SQLModel, table=True):
     buyer_id: UUID = Field(foreign_key="user.id", nullable=False)
     seller_id: UUID = Field(foreign_key="user.id", nullable=False)
 
+    # Id of the last transaction that wrote the row, drives the change feed
+    change_txid: int | None = Field(
+        default=None,
+        sa_column=Column(BigInteger, server_default=text("txid_current()"), nullable=False)
+    )
+
     buyer: "User" = Relationship(
         back_populates="purchases",
         sa_relationship_kwargs={
@@ -51,4 +65,23 @@ class Shipment(SQLModel, table=True):
 
     @property
     def seller_username(self) -> str | None:
-        return self.seller.username if self.seller else None
\ No newline at end of file
+        return self.seller.username if self.seller else None
+
+class ShipmentTombstone(SQLModel, table=True):
+    __tablename__ = "shipment_tombstone"
+    __table_args__ = (
+        Index("ix_shipment_tombstone_change_txid_id", "change_txid", "id"),
+    )
+
+    id: UUID = Field(
+        sa_column=Column(postgresql.UUID(as_uuid=True), primary_key=True)
+    )
+    buyer_id: UUID = Field(nullable=False)
+    seller_id: UUID = Field(nullable=False)
+    deleted_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    )
+    change_txid: int | None = Field(
+        default=None,
+        sa_column=Column(BigInteger, server_default=text("txid_current()"), nullable=False)
+    )
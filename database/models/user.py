@@ -7,6 +7,8 @@ from sqlalchemy import Column
 from sqlalchemy.dialects import postgresql
 from sqlmodel import Field, Relationship, SQLModel
 
+from .enums import NotificationMode
+
 if TYPE_CHECKING:
     from .shipment import Shipment
 
@@ -22,6 +24,7 @@ class User(SQLModel, table=True):
     email: EmailStr = Field(nullable=False, unique=True, index=True)
     email_verified: bool = Field(nullable=False, default=False)
     hashed_password: str = Field(nullable=False)
+    notification_mode: NotificationMode = Field(nullable=False, default=NotificationMode.INSTANT)
 
     purchases: List["Shipment"] = Relationship(
         back_populates="buyer",
@@ -0,0 +1,75 @@
+import time
+from typing import Any
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
+from sqlalchemy.util.queue import AsyncAdaptedQueue
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.overflow_opened = 0
+        self.timeouts = 0
+
+    def record_checkout(self) -> None:
+        self.checkouts += 1
+
+    def record_wait(self, wait_seconds: float) -> None:
+        self.waited_checkouts += 1
+        self.total_wait_seconds += wait_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+# Shared by every pool instance, engine.dispose() replaces the pool but keeps the counters
+pool_stats = PoolStats()
+
+
+class _TimedQueue(AsyncAdaptedQueue[ConnectionPoolEntry]):
+    def get(self, block: bool = True, timeout: float | None = None) -> ConnectionPoolEntry:
+        if not block:
+            return super().get(block, timeout)
+        # The pool only blocks once every connection, overflow included, is checked out. Opening a new
+        # connection happens outside the queue, so only the wait for another request to return one is timed.
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    _queue_class = _TimedQueue
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        try:
+            entry = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        pool_stats.record_checkout()
+        return entry
+
+    def _inc_overflow(self) -> bool:
+        # Checked right at the increment, other checkouts can move the counter while a connection is being opened
+        if not super()._inc_overflow():
+            return False
+        if self._overflow > 0:
+            pool_stats.overflow_opened += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": pool_stats.checkouts,
+            "waited_checkouts": pool_stats.waited_checkouts,
+            "avg_wait_ms": pool_stats.total_wait_seconds / pool_stats.checkouts * 1000 if pool_stats.checkouts else 0.0,
+            "max_wait_ms": pool_stats.max_wait_seconds * 1000,
+            "overflow_opened": pool_stats.overflow_opened,
+            "timeouts": pool_stats.timeouts,
+        }
@@ -0,0 +1,95 @@
+import asyncio
+import itertools
+from typing import Any
+from uuid import UUID
+
+from redis import asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+READ_YOUR_WRITES_PREFIX = "db:primary-reads:"
+
+# Replay lag in seconds; a replica that has replayed everything it received is current even if the primary is idle
+_REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.healthy = False
+        self.lag_seconds: float | None = None
+
+
+class ReplicaRouter:
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine], max_lag_seconds: float,
+                 health_check_interval: float, read_your_writes_seconds: int):
+        self.primary = primary
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.max_lag_seconds = max_lag_seconds
+        self.health_check_interval = health_check_interval
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.rotation = itertools.count()
+        self.monitor: asyncio.Task | None = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    async def start(self) -> None:
+        if self.enabled:
+            await self._check_replicas()
+            self.monitor = asyncio.create_task(self._monitor())
+
+    async def stop(self) -> None:
+        if self.monitor:
+            self.monitor.cancel()
+        self.monitor = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def pin_to_primary(self, user_id: UUID, redis: aioredis.Redis) -> None:
+        if self.enabled:
+            await redis.set(READ_YOUR_WRITES_PREFIX + str(user_id), 1, ex=self.read_your_writes_seconds)
+
+    async def engine_for(self, user_id: UUID, redis: aioredis.Redis) -> AsyncEngine:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy or await redis.exists(READ_YOUR_WRITES_PREFIX + str(user_id)):
+            self.primary_reads += 1
+            return self.primary
+        self.replica_reads += 1
+        return healthy[next(self.rotation) % len(healthy)].engine
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "replicas": len(self.replicas),
+            "healthy_replicas": sum(replica.healthy for replica in self.replicas),
+            "max_lag_seconds": max((replica.lag_seconds or 0 for replica in self.replicas), default=0),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+    async def _check_replicas(self) -> None:
+        for replica in self.replicas:
+            try:
+                replica.lag_seconds = await asyncio.wait_for(self._measure_lag(replica), self.health_check_interval)
+                replica.healthy = replica.lag_seconds <= self.max_lag_seconds
+            except Exception:
+                replica.healthy = False
+                replica.lag_seconds = None
+
+    @staticmethod
+    async def _measure_lag(replica: Replica) -> float:
+        async with replica.engine.connect() as connection:
+            return float(await connection.scalar(_REPLICA_LAG_QUERY))
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self._check_replicas()
@@ -11,4 +11,8 @@ class CamelModel(SQLModel):
 
 class PasswordResetModel(CamelModel):
     token: str
-    new_password: str
\ No newline at end of file
+    new_password: str
+
+class TokenPair(CamelModel):
+    access_token: str
+    refresh_token: str
@@ -1,19 +1,30 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any
 from uuid import UUID
 
+from pydantic import field_validator
 from sqlmodel import Field
 
 from ..models.enums import ProgressStatus, ApprovalStatus
 from .common import CamelModel
 
+def _assume_utc(value: datetime | None) -> datetime | None:
+    # Timestamps sent without an offset are taken as UTC, so every comparison is between aware datetimes
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 class ShipmentBase(CamelModel):
     product: str
     progress: ProgressStatus = ProgressStatus.PLACED
     estimated_delivery: datetime | None = Field(
-        default_factory=lambda: datetime.now() + timedelta(days=7)
+        default_factory=lambda: datetime.now(timezone.utc) + timedelta(days=7)
     )
     approval_status: ApprovalStatus = ApprovalStatus.PENDING
 
+    _estimated_delivery_utc = field_validator("estimated_delivery")(_assume_utc)
+
 class ShipmentCreate(ShipmentBase):
     buyer_id: UUID | None = None
     seller_id: UUID | None = None
@@ -30,6 +41,54 @@ class ShipmentSummary(CamelModel):
     buyer_username: str
     seller_username: str
 
+class ShipmentFilter(CamelModel):
+    progress: ProgressStatus | None = None
+    approval_status: ApprovalStatus | None = None
+    delivery_from: datetime | None = None
+    delivery_to: datetime | None = None
+
+    _delivery_range_utc = field_validator("delivery_from", "delivery_to")(_assume_utc)
+
+class ShipmentPage(CamelModel):
+    items: list[ShipmentSummary]
+    next_cursor: str | None = None
+
+class ShipmentChange(CamelModel):
+    id: UUID
+    deleted: bool = False
+    shipment: ShipmentSummary | None = None
+
+class ShipmentChangePage(CamelModel):
+    changes: list[ShipmentChange]
+    next_cursor: str
+    has_more: bool
+
+class ShipmentBulkCreate(CamelModel):
+    # Validated one by one as ShipmentCreateSimple, so a malformed item is reported instead of rejecting the batch
+    items: list[dict[str, Any]]
+
+class ShipmentBulkCreated(CamelModel):
+    index: int
+    shipment: ShipmentSummary
+
+class ShipmentBulkError(CamelModel):
+    index: int
+    code: str
+    message: str
+
+class ShipmentBulkResult(CamelModel):
+    created: list[ShipmentBulkCreated]
+    errors: list[ShipmentBulkError]
+
+class ShipmentRole(str, Enum):
+    BUYER = "buyer"
+    SELLER = "seller"
+    ANY = "any"
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from ..schemas.user import UserPlain
@@ -40,4 +99,11 @@ class ShipmentRead(ShipmentBase):
     seller: "UserPlain | None" = None
 
 class ShipmentStatusUpdate(CamelModel):
-    approval_status: ApprovalStatus
\ No newline at end of file
+    approval_status: ApprovalStatus
+
+class ShipmentBulkStatusUpdate(ShipmentStatusUpdate):
+    ids: list[UUID]
+
+class ShipmentBulkStatusResult(CamelModel):
+    updated: list[ShipmentSummary]
+    not_found: list[UUID]
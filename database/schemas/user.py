@@ -1,6 +1,7 @@
 from uuid import UUID
 from pydantic import EmailStr
 
+from ..models.enums import NotificationMode
 from .common import CamelModel
 from .shipment import ShipmentSummary
 
@@ -17,4 +18,10 @@ class UserCreate(UserBase):
 
 class UserRead(UserPlain):
     purchases: list[ShipmentSummary] = []
-    sales: list[ShipmentSummary] = []
\ No newline at end of file
+    sales: list[ShipmentSummary] = []
+
+class NotificationModeUpdate(CamelModel):
+    notification_mode: NotificationMode
+
+class NotificationRecipient(UserPlain):
+    notification_mode: NotificationMode
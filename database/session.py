@@ -1,11 +1,44 @@
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlmodel import SQLModel
 
 from ..config import db_settings
+from ..core.metrics import metrics
+from .pool import InstrumentedAsyncQueuePool
+from .replicas import ReplicaRouter
+
+_engine_options = dict(
+    pool_size=db_settings.DB_POOL_SIZE,
+    max_overflow=db_settings.DB_MAX_OVERFLOW,
+    pool_timeout=db_settings.DB_POOL_TIMEOUT,
+    pool_recycle=db_settings.DB_POOL_RECYCLE,
+    pool_pre_ping=db_settings.DB_POOL_PRE_PING,
+    connect_args={
+        "statement_cache_size": db_settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": db_settings.DB_STATEMENT_CACHE_SIZE,
+    }
+)
 
 engine = create_async_engine(
-    url=db_settings.POSTGRES_URL
+    url=db_settings.POSTGRES_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    **_engine_options
+)
+metrics.register("db_pool", lambda: engine.pool.stats())
+
+replica_router = ReplicaRouter(
+    engine,
+    [create_async_engine(url=url, **_engine_options) for url in db_settings.REPLICA_URLS],
+    max_lag_seconds=db_settings.REPLICA_MAX_LAG_SECONDS,
+    health_check_interval=db_settings.REPLICA_HEALTH_CHECK_INTERVAL,
+    read_your_writes_seconds=db_settings.READ_YOUR_WRITES_SECONDS
 )
+metrics.register("db_replicas", replica_router.stats)
 
 async def get_session():
     async with AsyncSession(engine) as session:
@@ -15,6 +48,23 @@ async def get_session():
             await session.rollback()
             raise
 
-async def create_tables():
-    async with engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    # For work that outlives the request handler, e.g. a StreamingResponse body
+    async with AsyncSession(engine) as session:
+        yield session
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "alembic"
+
+async def check_schema_version():
+    # Migrations are applied by `alembic upgrade head` before deploying, workers only confirm they ran
+    expected = ScriptDirectory(str(MIGRATIONS_DIR)).get_current_head()
+    try:
+        async with engine.connect() as conn:
+            current = await conn.scalar(text("SELECT version_num FROM alembic_version"))
+    except ProgrammingError:
+        current = None
+    if current != expected:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, this build expects {expected}. Run `alembic upgrade head`."
+        )
@@ -1,24 +1,29 @@
+from datetime import datetime
 from uuid import UUID
 
 from redis import asyncio as aioredis
-from fastapi import status, BackgroundTasks
+from fastapi import status, Query
 from fastapi.params import Depends
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Optional
 
-from .services.email_service import email_service
-from .services.socket_message_service import socket_message_service
-from .utils.utils import decode_access_token
+from .utils.utils import decode_access_token, ACCESS_TOKEN_VERSION
 from .services.redis_auth_service import RedisAuthService
 from .core import redis
+from .core.token_cache import token_cache
+from .config import security_settings
 from .database.schemas.user import UserPlain
+from .database.schemas.shipment import ShipmentFilter
+from .database.models.enums import ProgressStatus, ApprovalStatus
 from .database.models.user import User
 from .core.security import oauth2_scheme
-from .database.session import get_session
+from .database.session import get_session, replica_router
 from .services.shipments_service import ShipmentService
 from .services.users_service import UserService
 from .utils.exceptions import AppException
 from .utils.errors import ErrorCode
+from .utils.pagination import MAX_PAGE_SIZE
 
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
 
@@ -38,10 +43,15 @@ RedisAuthServiceDep = Annotated[RedisAuthService, Depends(get_redis_auth_service
 
 async def get_access_token_data(token: Annotated[str, Depends(oauth2_scheme)],
                                 redis_client: RedisAuthServiceDep) -> dict:
+    cached: dict | None = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    epoch = token_cache.epoch
     data: dict = decode_access_token(token)
 
     # Якщо токен у чорному списку (revoked)
-    if await redis_client.token_blacklisted(data["jti"]):
+    if await redis_client.token_revoked(data):
         raise AppException(
             status_code=status.HTTP_401_UNAUTHORIZED,  # Краще 401 для недійсних токенів
             code=ErrorCode.TOKEN_INVALID,
@@ -54,6 +64,7 @@ async def get_access_token_data(token: Annotated[str, Depends(oauth2_scheme)],
             code=ErrorCode.TOKEN_INVALID,
             message="Not authenticated"
         )
+    token_cache.put(token, data, epoch)
     return data
 
 
@@ -70,14 +81,84 @@ async def get_logged_in_user(token_data: Annotated[dict, Depends(get_access_toke
     return user
 
 
-def get_shipment_service(session: SessionDep, background_tasks: BackgroundTasks) -> ShipmentService:
-    return ShipmentService(session, socket_message_service, email_service, background_tasks)
+async def get_current_principal(token_data: Annotated[dict, Depends(get_access_token_data)],
+                                session: SessionDep) -> UserPlain:
+    claims: dict = token_data["user"]
+
+    # The signature already vouches for these claims, so current tokens never reach the database
+    if security_settings.STATELESS_AUTH and token_data.get("ver") == ACCESS_TOKEN_VERSION:
+        return UserPlain.model_validate(claims)
 
+    query = select(User.id, User.username, User.full_name, User.email).where(User.id == UUID(claims["id"]))
+    row = (await session.execute(query)).one_or_none()
+    if row is None:
+        raise AppException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            code=ErrorCode.USER_NOT_FOUND,
+            message="No authenticated user found"
+        )
+    return UserPlain.model_validate(row)
 
-def get_user_service(session: SessionDep, background_tasks: BackgroundTasks) -> UserService:
-    return UserService(session, email_service, background_tasks)
+
+def get_shipment_service(session: SessionDep) -> ShipmentService:
+    return ShipmentService(session)
+
+
+def get_user_service(session: SessionDep, redis_auth_service: RedisAuthServiceDep) -> UserService:
+    return UserService(session, redis_auth_service)
 
 
 ShipmentServiceDep = Annotated[ShipmentService, Depends(get_shipment_service)]
 UserServiceDep = Annotated[UserService, Depends(get_user_service)]
-UserDep = Annotated[UserPlain, Depends(get_logged_in_user)]
\ No newline at end of file
+UserDep = Annotated[UserPlain, Depends(get_current_principal)]
+UserModelDep = Annotated[User, Depends(get_logged_in_user)]
+
+
+async def get_read_session(current_user: UserDep,
+                           redis_client: Annotated[aioredis.Redis, Depends(get_redis_client)]):
+    # Read-only routes go to a healthy replica unless the user wrote something moments ago
+    read_engine = await replica_router.engine_for(current_user.id, redis_client)
+    async with AsyncSession(read_engine) as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def pin_reads_to_primary(current_user: UserDep,
+                               redis_client: Annotated[aioredis.Redis, Depends(get_redis_client)]) -> None:
+    await replica_router.pin_to_primary(current_user.id, redis_client)
+
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+def get_read_shipment_service(session: ReadSessionDep) -> ShipmentService:
+    return ShipmentService(session)
+
+
+def get_read_user_service(session: ReadSessionDep, redis_auth_service: RedisAuthServiceDep) -> UserService:
+    return UserService(session, redis_auth_service)
+
+
+ReadShipmentServiceDep = Annotated[ShipmentService, Depends(get_read_shipment_service)]
+ReadUserServiceDep = Annotated[UserService, Depends(get_read_user_service)]
+
+
+def get_shipment_filter(
+        progress: ProgressStatus | None = None,
+        approval_status: Annotated[ApprovalStatus | None, Query(alias="approvalStatus")] = None,
+        delivery_from: Annotated[datetime | None, Query(alias="deliveryFrom")] = None,
+        delivery_to: Annotated[datetime | None, Query(alias="deliveryTo")] = None,
+) -> ShipmentFilter:
+    return ShipmentFilter(
+        progress=progress,
+        approval_status=approval_status,
+        delivery_from=delivery_from,
+        delivery_to=delivery_to,
+    )
+
+
+ShipmentFilterDep = Annotated[ShipmentFilter, Depends(get_shipment_filter)]
+PageLimitQuery = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,17 +6,32 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from utils.exceptions import add_exception_handlers
 from .core.redis import init_redis, close_redis
+from .core.security import password_hasher
+from .config import socket_settings
+from .utils.socket_manager import socket_manager
+from .services.outbox_relay import outbox_relay
+from .dependencies import get_redis_client
+from .services.redis_auth_service import RedisAuthService
 from .routers.master_router import master_router
-from .database.session import create_tables
+from .database.session import check_schema_version, replica_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await create_tables()
+    await check_schema_version()
     await init_redis()
+    await replica_router.start()
+    revocation_listener = asyncio.create_task(RedisAuthService(get_redis_client()).listen_for_revocations())
+    await socket_manager.start(get_redis_client(), distributed=socket_settings.SOCKET_BACKEND == "redis")
+    await outbox_relay.start(get_redis_client())
 
     yield
 
+    await outbox_relay.stop()
+    await socket_manager.stop()
+    revocation_listener.cancel()
+    password_hasher.shutdown()
+    await replica_router.stop()
     await close_redis()
 
 app = FastAPI(lifespan = lifespan)
@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
-from . import users, shipments
+from . import users, shipments, metrics
 
 master_router = APIRouter()
 
 master_router.include_router(shipments.router)
-master_router.include_router(users.router)
\ No newline at end of file
+master_router.include_router(users.router)
+master_router.include_router(metrics.router)
\ No newline at end of file
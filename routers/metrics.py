@@ -0,0 +1,11 @@
+from typing import Any
+
+from fastapi import APIRouter
+
+from ..core.metrics import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> dict[str, dict[str, Any]]:
+    return metrics.snapshot()
@@ -1,38 +1,91 @@
-from typing import List
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
 
 from ..database.models.shipment import Shipment
-from ..database.schemas.shipment import ShipmentSummary, ShipmentCreateSimple, ShipmentStatusUpdate
-from ..dependencies import ShipmentServiceDep, UserDep
-from ..utils.exceptions import AppException
+from ..database.schemas.shipment import (
+    ExportFormat,
+    ShipmentBulkCreate,
+    ShipmentBulkResult,
+    ShipmentBulkStatusResult,
+    ShipmentBulkStatusUpdate,
+    ShipmentChangePage,
+    ShipmentCreateSimple,
+    ShipmentPage,
+    ShipmentRole,
+    ShipmentStatusUpdate,
+    ShipmentSummary,
+)
+from ..dependencies import (
+    PageLimitQuery,
+    ReadShipmentServiceDep,
+    ShipmentFilterDep,
+    ShipmentServiceDep,
+    UserDep,
+    pin_reads_to_primary,
+)
 from ..utils.errors import ErrorCode
+from ..utils.exceptions import AppException
+from ..utils.pagination import DEFAULT_PAGE_SIZE
 
 router = APIRouter(prefix="/shipments", tags=["Shipments"])
 
-@router.get("/", response_model=List[ShipmentSummary])
+_EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+@router.get("/", response_model=ShipmentPage)
 async def get_all_shipments(current_user: UserDep,
-                            shipment_service: ShipmentServiceDep) -> List[ShipmentSummary]:
-    return await shipment_service.get_all_shipments()
+                            shipment_service: ReadShipmentServiceDep,
+                            filters: ShipmentFilterDep,
+                            limit: PageLimitQuery = DEFAULT_PAGE_SIZE,
+                            cursor: str | None = None) -> ShipmentPage:
+    return await shipment_service.get_all_shipments(filters, limit, cursor)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_shipments(current_user: UserDep,
+                           shipment_service: ShipmentServiceDep,
+                           filters: ShipmentFilterDep,
+                           export_format: Annotated[ExportFormat, Query(alias="format")] = ExportFormat.NDJSON
+                           ) -> StreamingResponse:
+    return StreamingResponse(
+        shipment_service.export_shipments(filters, export_format),
+        media_type=_EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="shipments.{export_format.value}"'}
+    )
 
 
-@router.get("/my", response_model=List[ShipmentSummary])
+@router.get("/changes", response_model=ShipmentChangePage)
+async def get_shipment_changes(current_user: UserDep,
+                               shipment_service: ShipmentServiceDep,
+                               since: str | None = None,
+                               limit: PageLimitQuery = DEFAULT_PAGE_SIZE) -> ShipmentChangePage:
+    return await shipment_service.get_changes(since, limit)
+
+
+@router.get("/my", response_model=ShipmentPage)
 async def get_my_shipments(
         current_user: UserDep,
-        service: ShipmentServiceDep
-):
-    shipments = await service.get_shipments_by_user_id(current_user.id)
-    return shipments
+        service: ReadShipmentServiceDep,
+        role: ShipmentRole = ShipmentRole.ANY,
+        limit: PageLimitQuery = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None
+) -> ShipmentPage:
+    return await service.get_user_shipments(current_user.id, role, limit, cursor)
 
 @router.get("/{shipment_id}", response_model=Shipment)
 async def get_shipment_by_id(shipment_id: UUID,
-                             shipment_service: ShipmentServiceDep,
+                             shipment_service: ReadShipmentServiceDep,
                              current_user: UserDep
                              ) -> Shipment:
     return await shipment_service.get_shipment_by_id(shipment_id)
 
-@router.post("/", status_code=status.HTTP_201_CREATED, response_model=ShipmentSummary)
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=ShipmentSummary,
+             dependencies=[Depends(pin_reads_to_primary)])
 async def create_shipment(current_user: UserDep,
                           shipment_data_simple: ShipmentCreateSimple,
                           shipment_service: ShipmentServiceDep) -> ShipmentSummary:
@@ -44,14 +97,30 @@ async def create_shipment(current_user: UserDep,
         )
     return await shipment_service.create_shipment(shipment_data_simple, current_user.id)
 
-@router.patch("/{shipment_id}/approval", status_code=status.HTTP_200_OK, response_model=ShipmentSummary)
+@router.post("/bulk", response_model=ShipmentBulkResult, dependencies=[Depends(pin_reads_to_primary)])
+async def create_shipments(current_user: UserDep,
+                           bulk_data: ShipmentBulkCreate,
+                           shipment_service: ShipmentServiceDep) -> ShipmentBulkResult:
+    return await shipment_service.create_shipments(bulk_data.items, current_user.id)
+
+@router.patch("/bulk/approval", response_model=ShipmentBulkStatusResult,
+              dependencies=[Depends(pin_reads_to_primary)])
+async def update_shipments_approval_status(current_user: UserDep,
+                                           status_update: ShipmentBulkStatusUpdate,
+                                           shipment_service: ShipmentServiceDep) -> ShipmentBulkStatusResult:
+    return await shipment_service.update_shipments_approval_status(
+        status_update.ids, status_update.approval_status, current_user.id
+    )
+
+@router.patch("/{shipment_id}/approval", status_code=status.HTTP_200_OK, response_model=ShipmentSummary,
+              dependencies=[Depends(pin_reads_to_primary)])
 async def update_shipment_approval_status(shipment_service: ShipmentServiceDep,
                                           shipment_id: UUID,
                                           status_update: ShipmentStatusUpdate,
                                           current_user: UserDep) -> ShipmentSummary:
      return await shipment_service.update_shipment_approval_status(shipment_id, status_update.approval_status)
 
-@router.delete("/{shipment_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{shipment_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(pin_reads_to_primary)])
 async def delete_shipment(shipment_id: UUID,
                           shipment_service: ShipmentServiceDep,
                           current_user: UserDep) -> None:
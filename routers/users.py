@@ -1,24 +1,39 @@
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status, Body
+from fastapi import APIRouter, Depends, status, Body, Cookie, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
-from ..database.schemas.common import PasswordResetModel
-from ..services.socket_message_service import socket_message_service
+from ..config import security_settings
+from ..database.schemas.common import PasswordResetModel, TokenPair
 from ..core.security import oauth2_scheme
-from ..database.schemas.user import UserCreate, UserRead
-from ..dependencies import UserServiceDep, get_access_token_data, get_redis_auth_service
+from ..database.schemas.user import UserCreate, UserRead, NotificationModeUpdate
+from ..dependencies import UserServiceDep, UserDep, get_access_token_data, get_redis_auth_service, ReadUserServiceDep, \
+    pin_reads_to_primary
 from ..services.redis_auth_service import RedisAuthService
-from ..utils.socket_manager import socket_manager
+from ..utils.socket_manager import socket_manager, PONG_FRAME
 from ..utils.utils import decode_access_token
 from ..utils.exceptions import AppException
 from ..utils.errors import ErrorCode
 
 router = APIRouter(tags=["Users"])
 
+REFRESH_COOKIE_NAME = "refresh_token"
+
+
+def _set_refresh_cookie(response: Response, token_pair: TokenPair) -> None:
+    response.set_cookie(
+        REFRESH_COOKIE_NAME,
+        token_pair.refresh_token,
+        max_age=security_settings.REFRESH_TOKEN_TTL_DAYS * 24 * 60 * 60,
+        httponly=True,
+        secure=security_settings.REFRESH_COOKIE_SECURE,
+        samesite="lax",
+    )
+
+
 @router.post("/signup", status_code=status.HTTP_201_CREATED)
 async def signup(user_data: UserCreate, users_service: UserServiceDep) -> None:
     await users_service.register_user(user_data)
@@ -26,13 +41,32 @@ async def signup(user_data: UserCreate, users_service: UserServiceDep) -> None:
 
 @router.post("/token")
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], users_service: UserServiceDep
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], users_service: UserServiceDep, response: Response
 ) -> str:
-    return await users_service.token(form_data.username, form_data.password)
+    token_pair = await users_service.token(form_data.username, form_data.password)
+    _set_refresh_cookie(response, token_pair)
+    return token_pair.access_token
+
+
+@router.post("/token/refresh")
+async def refresh_access_token(
+    users_service: UserServiceDep,
+    response: Response,
+    refresh_token: Annotated[str | None, Cookie(alias=REFRESH_COOKIE_NAME)] = None,
+) -> str:
+    if refresh_token is None:
+        raise AppException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            code=ErrorCode.REFRESH_TOKEN_INVALID,
+            message="Missing refresh token"
+        )
+    token_pair = await users_service.refresh_token(refresh_token)
+    _set_refresh_cookie(response, token_pair)
+    return token_pair.access_token
 
 
 @router.get("/decode")
-async def decode_token(token: Annotated[str, Depends(oauth2_scheme)], users_service: UserServiceDep) -> UserRead:
+async def decode_token(token: Annotated[str, Depends(oauth2_scheme)], users_service: ReadUserServiceDep) -> UserRead:
     data = decode_access_token(token)
     if data is None:
         raise AppException(
@@ -49,12 +83,31 @@ async def decode_token(token: Annotated[str, Depends(oauth2_scheme)], users_serv
 async def logout(
     token_data: Annotated[dict, Depends(get_access_token_data)],
     redis_auth_service: Annotated[RedisAuthService, Depends(get_redis_auth_service)],
+    response: Response,
+    refresh_token: Annotated[str | None, Cookie(alias=REFRESH_COOKIE_NAME)] = None,
 ) -> None:
     await redis_auth_service.revoke_token(token_data)
+    if refresh_token is not None:
+        await redis_auth_service.revoke_refresh_token(refresh_token)
+    response.delete_cookie(REFRESH_COOKIE_NAME)
+
+
+@router.get("/logout-all")
+async def logout_all(
+    current_user: UserDep,
+    redis_auth_service: Annotated[RedisAuthService, Depends(get_redis_auth_service)],
+) -> None:
+    await redis_auth_service.revoke_all_tokens(current_user.id)
+
+
+@router.put("/notification-mode", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(pin_reads_to_primary)])
+async def set_notification_mode(current_user: UserDep, users_service: UserServiceDep,
+                                mode_update: NotificationModeUpdate) -> None:
+    await users_service.set_notification_mode(current_user.id, mode_update.notification_mode)
 
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, token: str) -> None:
+async def websocket_endpoint(websocket: WebSocket, token: str, last_event_id: str | None = None) -> None:
     user_id: UUID
     try:
         payload = decode_access_token(token)
@@ -63,15 +116,17 @@ async def websocket_endpoint(websocket: WebSocket, token: str) -> None:
         print("WS Auth error", e)
         await websocket.close(1008)
         return
-    await socket_manager.connect(websocket, user_id)
+    connection = await socket_manager.connect(websocket, user_id, last_event_id)
     try:
         while True:
             text: str = await websocket.receive_text()
+            connection.touch()
             if text == 'PING':
-                print(text)
-                await socket_message_service.heartbeat(user_id)
+                connection.enqueue(PONG_FRAME)
     except WebSocketDisconnect:
-        socket_manager.disconnect(websocket, user_id)
+        pass
+    finally:
+        await socket_manager.disconnect(websocket, user_id)
 
 @router.post("/verify-email")
 async def verify_email(token: str, users_service: UserServiceDep) -> None:
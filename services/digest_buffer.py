@@ -0,0 +1,47 @@
+import json
+from uuid import UUID
+
+from redis import asyncio as aioredis
+
+from ..database.schemas.shipment import ShipmentSummary
+from ..database.schemas.user import UserBase
+
+DIGEST_EVENTS_PREFIX = "notify:digest:"
+DIGEST_PENDING_KEY = "notify:digest:pending"
+
+
+class DigestBuffer:
+    def __init__(self, redis: aioredis.Redis):
+        self.redis = redis
+
+    async def add(self, entries: list[tuple[UUID | str, UserBase, dict]]) -> None:
+        # The event list and the pending set change together, so a drain never sees one without the other
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for user_id, recipient, event in entries:
+                pipe.rpush(
+                    DIGEST_EVENTS_PREFIX + str(user_id),
+                    json.dumps({"recipient": recipient.model_dump(mode="json"), **event})
+                )
+                pipe.sadd(DIGEST_PENDING_KEY, str(user_id))
+            await pipe.execute()
+
+    async def pop_pending_users(self, count: int) -> list[str]:
+        return await self.redis.spop(DIGEST_PENDING_KEY, count) or []
+
+    async def drain(self, user_id: str, max_events: int) -> tuple[list[dict], int]:
+        key = DIGEST_EVENTS_PREFIX + user_id
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrange(key, 0, max_events - 1)
+            pipe.llen(key)
+            pipe.delete(key)
+            events, total, _ = await pipe.execute()
+        return [json.loads(event) for event in events], total
+
+
+def digest_event(kind: str, role: str, shipment: ShipmentSummary, counterparty: UserBase) -> dict:
+    return {
+        "kind": kind,
+        "role": role,
+        "shipment": shipment.model_dump(mode="json"),
+        "counterparty": counterparty.model_dump(mode="json"),
+    }
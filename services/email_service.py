@@ -1,25 +1,39 @@
 from pathlib import Path
-from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 from pydantic import NameEmail
 
-from ..config import app_settings
+from ..config import app_settings, email_notification_settings
+from ..core.metrics import metrics
 from ..database.schemas.shipment import ShipmentSummary
 from ..database.schemas.user import UserBase
 from ..utils.mail_manager import MailManager
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "email_templates"))
+# Templates only change with a deploy, so they are never re-checked on disk once compiled.
+# Compiled bytecode is shared on disk between worker processes and restarts.
+templates = Environment(
+    loader=FileSystemLoader(BASE_DIR / "email_templates"),
+    bytecode_cache=FileSystemBytecodeCache(email_notification_settings.EMAIL_TEMPLATE_CACHE_DIR),
+    autoescape=True,
+    auto_reload=False,
+)
+
+
+def precompile_templates() -> None:
+    for template_name in templates.list_templates(extensions=["html"]):
+        templates.get_template(template_name)
+
 
 class EmailService:
     def __init__(self, manager: MailManager = MailManager()) -> None:
         self.manager = manager
         self.base_url = app_settings.APP_CLIENT_DOMAIN
         self.protocol = 'http://'
+        # Values shared by every email are looked up from the environment instead of being merged into each context
+        templates.globals["base_url"] = self.protocol + self.base_url
 
     def _render_template(self, template_name: str, context: dict) -> str:
-        context.update({"base_url": self.protocol +  self.base_url})
-        template = templates.get_template(template_name)
-        return template.render(context)
+        return templates.get_template(template_name).render(context)
 
     async def send_verification_email(self, user: UserBase, token: str) -> None:
         verification_link = f"{self.protocol}{self.base_url}/verify-email?token={token}"
@@ -39,69 +53,73 @@ class EmailService:
             body=email_body
         )
 
-    async def send_modified_approval_email(self, shipment: ShipmentSummary, seller: UserBase, buyer: UserBase) -> None:
+    async def send_modified_approval_email(self, shipment: ShipmentSummary, seller: UserBase, buyer: UserBase,
+                                           notify_seller: bool = True, notify_buyer: bool = True) -> None:
         buyer_info = f"{buyer.username} ({buyer.email})"
         seller_info = f"{seller.username} ({seller.email})"
         delivery_date = shipment.estimated_delivery.strftime("%Y-%m-%d %H:%M") if shipment.estimated_delivery else "N/A"
 
-        seller_email = NameEmail(seller.full_name, str(seller.email))
-        seller_body = self._render_template("shipment_status.html", {
-            "title": "Shipment Status Update",
-            "recipient_name": seller.full_name,
-            "main_message": "The approval status for your shipment has been modified.",
-            "highlight_box": f"Changes made by: <strong>{buyer_info}</strong>",
-            "shipment": shipment,
-            "delivery_date": delivery_date,
-            "counterparty_label": "Buyer",
-            "counterparty_info": buyer_info
-        })
-
-        buyer_email = NameEmail(buyer.full_name, str(buyer.email))
-        buyer_body = self._render_template("shipment_status.html", {
-            "title": "Order Status Changed",
-            "recipient_name": buyer.full_name,
-            "main_message": "The status of your purchase was recently updated.",
-            "highlight_box": "<strong>Was this you?</strong><br>If you didn't authorize this change, contact support.",
-            "shipment": shipment,
-            "delivery_date": delivery_date,
-            "counterparty_label": "Seller",
-            "counterparty_info": seller_info
-        })
-
-        await self.manager.send_html_email([seller_email], subject=f"Shipment Update: {shipment.product}", body=seller_body)
-        await self.manager.send_html_email([buyer_email], subject=f"Order Update: {shipment.product}", body=buyer_body)
-
-    async def send_shipment_created_email(self, shipment: ShipmentSummary, seller: UserBase, buyer: UserBase) -> None:
+        if notify_seller:
+            seller_email = NameEmail(seller.full_name, str(seller.email))
+            seller_body = self._render_template("shipment_status.html", {
+                "title": "Shipment Status Update",
+                "recipient_name": seller.full_name,
+                "main_message": "The approval status for your shipment has been modified.",
+                "highlight_box": f"Changes made by: <strong>{buyer_info}</strong>",
+                "shipment": shipment,
+                "delivery_date": delivery_date,
+                "counterparty_label": "Buyer",
+                "counterparty_info": buyer_info
+            })
+            await self.manager.send_html_email([seller_email], subject=f"Shipment Update: {shipment.product}", body=seller_body)
+
+        if notify_buyer:
+            buyer_email = NameEmail(buyer.full_name, str(buyer.email))
+            buyer_body = self._render_template("shipment_status.html", {
+                "title": "Order Status Changed",
+                "recipient_name": buyer.full_name,
+                "main_message": "The status of your purchase was recently updated.",
+                "highlight_box": "<strong>Was this you?</strong><br>If you didn't authorize this change, contact support.",
+                "shipment": shipment,
+                "delivery_date": delivery_date,
+                "counterparty_label": "Seller",
+                "counterparty_info": seller_info
+            })
+            await self.manager.send_html_email([buyer_email], subject=f"Order Update: {shipment.product}", body=buyer_body)
+
+    async def send_shipment_created_email(self, shipment: ShipmentSummary, seller: UserBase, buyer: UserBase,
+                                          notify_seller: bool = True, notify_buyer: bool = True) -> None:
         buyer_info = f"{buyer.username} ({buyer.email})"
         seller_info = f"{seller.username} ({seller.email})"
         delivery_date = shipment.estimated_delivery.strftime("%Y-%m-%d %H:%M") if shipment.estimated_delivery else "N/A"
 
-        buyer_email = NameEmail(buyer.full_name, str(buyer.email))
-        buyer_body = self._render_template("shipment_status.html", {
-            "title": "Action Required: New Shipment",
-            "recipient_name": buyer.full_name,
-            "main_message": f"A new shipment containing '<strong>{shipment.product}</strong>' has been initiated.",
-            "highlight_box": "<strong>Action Required:</strong><br>Please log in to Approve or Reject this shipment.",
-            "shipment": shipment,
-            "delivery_date": delivery_date,
-            "counterparty_label": "Seller",
-            "counterparty_info": seller_info
-        })
-
-        seller_email = NameEmail(seller.full_name, str(seller.email))
-        seller_body = self._render_template("shipment_status.html", {
-            "title": "Shipment Created",
-            "recipient_name": seller.full_name,
-            "main_message": f"Your shipment '<strong>{shipment.product}</strong>' has been registered.",
-            "highlight_box": "<strong>Status: Pending Approval</strong><br>Waiting for buyer response.",
-            "shipment": shipment,
-            "delivery_date": delivery_date,
-            "counterparty_label": "Buyer",
-            "counterparty_info": buyer_info
-        })
-
-        await self.manager.send_html_email([buyer_email], subject=f"Action Required: {shipment.product}", body=buyer_body)
-        await self.manager.send_html_email([seller_email], subject=f"Shipment Created: {shipment.product}", body=seller_body)
+        if notify_buyer:
+            buyer_email = NameEmail(buyer.full_name, str(buyer.email))
+            buyer_body = self._render_template("shipment_status.html", {
+                "title": "Action Required: New Shipment",
+                "recipient_name": buyer.full_name,
+                "main_message": f"A new shipment containing '<strong>{shipment.product}</strong>' has been initiated.",
+                "highlight_box": "<strong>Action Required:</strong><br>Please log in to Approve or Reject this shipment.",
+                "shipment": shipment,
+                "delivery_date": delivery_date,
+                "counterparty_label": "Seller",
+                "counterparty_info": seller_info
+            })
+            await self.manager.send_html_email([buyer_email], subject=f"Action Required: {shipment.product}", body=buyer_body)
+
+        if notify_seller:
+            seller_email = NameEmail(seller.full_name, str(seller.email))
+            seller_body = self._render_template("shipment_status.html", {
+                "title": "Shipment Created",
+                "recipient_name": seller.full_name,
+                "main_message": f"Your shipment '<strong>{shipment.product}</strong>' has been registered.",
+                "highlight_box": "<strong>Status: Pending Approval</strong><br>Waiting for buyer response.",
+                "shipment": shipment,
+                "delivery_date": delivery_date,
+                "counterparty_label": "Buyer",
+                "counterparty_info": buyer_info
+            })
+            await self.manager.send_html_email([seller_email], subject=f"Shipment Created: {shipment.product}", body=seller_body)
 
     async def send_password_reset_email(self, user: UserBase, token: str) -> None:
         reset_link = f"{self.protocol}{self.base_url}/reset-password?token={token}"
@@ -126,4 +144,55 @@ class EmailService:
             body=email_body
         )
 
-email_service = EmailService()
\ No newline at end of file
+    async def send_digest_email(self, recipient: UserBase, events: list[dict], total: int) -> None:
+        await self._send_event_list_email(
+            recipient, events, total,
+            title="Your Shipment Summary",
+            main_message=f"There were {total} updates to your shipments since your last summary."
+        )
+
+    async def send_shipment_updates_email(self, recipient: UserBase, events: list[dict]) -> None:
+        await self._send_event_list_email(
+            recipient, events, len(events),
+            title="Shipments Updated",
+            main_message=f"{len(events)} of your shipments were just updated."
+        )
+
+    async def _send_event_list_email(self, recipient: UserBase, events: list[dict], total: int, title: str,
+                                     main_message: str) -> None:
+        recipient_email = NameEmail(recipient.full_name, str(recipient.email))
+        email_body = self._render_template("digest.html", {
+            "title": title,
+            "recipient_name": recipient.full_name,
+            "main_message": main_message,
+            "events": [self._digest_entry(event) for event in events],
+            "remaining": total - len(events)
+        })
+
+        await self.manager.send_html_email(
+            [recipient_email],
+            subject=f"FastShip - {total} shipment updates",
+            body=email_body
+        )
+
+    @staticmethod
+    def _digest_entry(event: dict) -> dict:
+        shipment = ShipmentSummary(**event["shipment"])
+        counterparty = UserBase(**event["counterparty"])
+        return {
+            "label": _DIGEST_LABELS[event["kind"], event["role"]],
+            "shipment": shipment,
+            "delivery_date": shipment.estimated_delivery.strftime("%Y-%m-%d %H:%M"),
+            "counterparty_label": "Buyer" if event["role"] == "seller" else "Seller",
+            "counterparty_info": f"{counterparty.username} ({counterparty.email})"
+        }
+
+_DIGEST_LABELS = {
+    ("shipment_created", "buyer"): "Awaiting your approval",
+    ("shipment_created", "seller"): "Shipment created",
+    ("modified_approval", "buyer"): "Order status changed",
+    ("modified_approval", "seller"): "Approval status changed",
+}
+
+email_service = EmailService()
+metrics.register("smtp_pool", email_service.manager.pool.stats)
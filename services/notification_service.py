@@ -0,0 +1,60 @@
+import asyncio
+
+from ..celery_module.worker import send_email_batch_task, email_job
+from ..database.models.enums import NotificationMode
+from ..database.schemas.user import UserBase
+from .digest_buffer import DigestBuffer, digest_event
+from ..database.schemas.shipment import ShipmentSummary
+
+SHIPMENT_CREATED = "shipment_created"
+MODIFIED_APPROVAL = "modified_approval"
+# Many shipments between one seller and buyer, each party gets a single email listing all of them
+BULK_MODIFIED_APPROVAL = "bulk_modified_approval"
+
+
+class NotificationService:
+    def __init__(self, digest_buffer: DigestBuffer):
+        self.digest_buffer = digest_buffer
+
+    async def dispatch(self, events: list[tuple[str, dict]]) -> None:
+        # Instant recipients of a whole batch of events share one Celery message, digest ones one Redis transaction
+        jobs = []
+        digests = []
+        for kind, payload in events:
+            if kind == BULK_MODIFIED_APPROVAL:
+                self._collect_batch(payload, jobs, digests)
+                continue
+            shipment = ShipmentSummary(**payload["shipment"])
+            seller, buyer = payload["seller"], payload["buyer"]
+            seller_data, buyer_data = UserBase(**seller), UserBase(**buyer)
+            notify_seller = seller["notification_mode"] == NotificationMode.INSTANT
+            notify_buyer = buyer["notification_mode"] == NotificationMode.INSTANT
+
+            if notify_seller or notify_buyer:
+                jobs.append(email_job(
+                    kind, payload["shipment"], seller_data.model_dump(mode="json"), buyer_data.model_dump(mode="json"),
+                    notify_seller, notify_buyer
+                ))
+            if not notify_seller:
+                digests.append((seller["id"], seller_data, digest_event(kind, "seller", shipment, buyer_data)))
+            if not notify_buyer:
+                digests.append((buyer["id"], buyer_data, digest_event(kind, "buyer", shipment, seller_data)))
+
+        if digests:
+            await self.digest_buffer.add(digests)
+        if jobs:
+            # Publishing to the broker is blocking I/O
+            await asyncio.to_thread(send_email_batch_task.delay, jobs)
+
+    @staticmethod
+    def _collect_batch(payload: dict, jobs: list[dict], digests: list[tuple]) -> None:
+        shipments = [ShipmentSummary(**shipment) for shipment in payload["shipments"]]
+        seller, buyer = payload["seller"], payload["buyer"]
+        seller_data, buyer_data = UserBase(**seller), UserBase(**buyer)
+        for role, party, party_data, counterparty in (("seller", seller, seller_data, buyer_data),
+                                                      ("buyer", buyer, buyer_data, seller_data)):
+            party_events = [digest_event(MODIFIED_APPROVAL, role, shipment, counterparty) for shipment in shipments]
+            if party["notification_mode"] == NotificationMode.INSTANT:
+                jobs.append(email_job("shipment_updates", party_data.model_dump(mode="json"), party_events))
+            else:
+                digests.extend((party["id"], party_data, event) for event in party_events)
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from uuid import UUID
+
+from redis import asyncio as aioredis
+from sqlalchemy import Row, delete, func, select, update
+
+from ..config import outbox_settings
+from ..core.metrics import metrics
+from ..database.models.outbox import OutboxEvent
+from ..database.models.user import User
+from ..database.schemas.shipment import ShipmentSummary
+from ..database.schemas.user import NotificationRecipient
+from ..database.session import session_scope
+from .digest_buffer import DigestBuffer
+from .notification_service import NotificationService, SHIPMENT_CREATED, MODIFIED_APPROVAL, BULK_MODIFIED_APPROVAL
+from .socket_message_service import SocketMessageService, socket_message_service
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL_SECONDS = 60
+
+# Which party gets a socket event for each outbox event type
+_SOCKET_EVENTS = {
+    SHIPMENT_CREATED: ("buyer", "PURCHASE_ADD"),
+    MODIFIED_APPROVAL: ("seller", "SALE_UPDATE"),
+    BULK_MODIFIED_APPROVAL: ("seller", "SALE_UPDATE_BATCH"),
+}
+
+
+def _recipient(user: User | NotificationRecipient) -> dict[str, Any]:
+    return NotificationRecipient.model_validate(user).model_dump(mode="json")
+
+
+def shipment_outbox_event(event_type: str, shipment: ShipmentSummary, seller: User | NotificationRecipient,
+                          buyer: User | NotificationRecipient) -> OutboxEvent:
+    return OutboxEvent(
+        event_type=event_type,
+        payload={
+            "shipment": shipment.model_dump(mode="json"),
+            "seller": _recipient(seller),
+            "buyer": _recipient(buyer),
+        }
+    )
+
+
+def shipment_batch_outbox_event(event_type: str, shipments: list[ShipmentSummary], seller: NotificationRecipient,
+                                buyer: NotificationRecipient) -> OutboxEvent:
+    return OutboxEvent(
+        event_type=event_type,
+        payload={
+            "shipments": [shipment.model_dump(mode="json") for shipment in shipments],
+            "seller": _recipient(seller),
+            "buyer": _recipient(buyer),
+        }
+    )
+
+
+def _socket_payload(payload: dict[str, Any]) -> ShipmentSummary | list[ShipmentSummary]:
+    if "shipments" in payload:
+        return [ShipmentSummary(**shipment) for shipment in payload["shipments"]]
+    return ShipmentSummary(**payload["shipment"])
+
+
+class OutboxRelay:
+    def __init__(self, socket_service: SocketMessageService = socket_message_service,
+                 batch_size: int = outbox_settings.OUTBOX_BATCH_SIZE,
+                 poll_interval: float = outbox_settings.OUTBOX_POLL_INTERVAL,
+                 retention_hours: int = outbox_settings.OUTBOX_RETENTION_HOURS,
+                 max_attempts: int = outbox_settings.OUTBOX_MAX_ATTEMPTS,
+                 retry_base_seconds: float = outbox_settings.OUTBOX_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = outbox_settings.OUTBOX_RETRY_MAX_SECONDS):
+        self.socket_service = socket_service
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retention = timedelta(hours=retention_hours)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.notification_service: NotificationService | None = None
+        self.task: asyncio.Task | None = None
+        self.wakeup = asyncio.Event()
+        self.last_pruned = 0.0
+        self.relayed = 0
+        self.failures = 0
+        self.parked = 0
+
+    async def start(self, redis: aioredis.Redis) -> None:
+        self.notification_service = NotificationService(DigestBuffer(redis))
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+        self.task = None
+
+    def wake(self) -> None:
+        # Lets a freshly committed event go out without waiting for the next poll
+        self.wakeup.set()
+
+    def stats(self) -> dict[str, Any]:
+        return {"relayed_events": self.relayed, "relay_failures": self.failures, "parked_events": self.parked}
+
+    async def relay_batch(self) -> int:
+        async with session_scope() as session:
+            # Every API worker runs a relay, SKIP LOCKED hands each of them a different batch
+            rows = (await session.execute(
+                select(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload, OutboxEvent.attempts)
+                .where(
+                    OutboxEvent.sent_at.is_(None),
+                    OutboxEvent.parked_at.is_(None),
+                    OutboxEvent.next_attempt_at <= func.now()
+                )
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return 0
+
+            # Events that failed before go out one by one, so a bad one only holds back itself
+            fresh = [row for row in rows if row.attempts == 0]
+            groups = ([fresh] if fresh else []) + [[row] for row in rows if row.attempts > 0]
+            sent, failed = [], []
+            for group in groups:
+                try:
+                    await self._publish(group)
+                    sent.extend(group)
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Relaying outbox events %s failed", [row.id for row in group])
+                    failed.extend(group)
+
+            # Rows are only marked once everything is published, a crash in between sends them again
+            if sent:
+                await session.execute(
+                    update(OutboxEvent).where(OutboxEvent.id.in_([row.id for row in sent])).values(sent_at=func.now())
+                )
+            if failed:
+                await session.execute(update(OutboxEvent), [self._retry(row) for row in failed])
+            await session.commit()
+        self.relayed += len(sent)
+        return len(rows)
+
+    async def _publish(self, rows: list[Row]) -> None:
+        events = [(row.event_type, row.payload) for row in rows]
+        await self.socket_service.send_shipment_events([
+            (UUID(payload[_SOCKET_EVENTS[event_type][0]]["id"]), _SOCKET_EVENTS[event_type][1],
+             _socket_payload(payload))
+            for event_type, payload in events
+        ])
+        await self.notification_service.dispatch(events)
+
+    def _retry(self, row: Row) -> dict[str, Any]:
+        attempts = row.attempts + 1
+        if attempts >= self.max_attempts:
+            self.parked += 1
+            logger.error("Parking outbox event %s after %s failed attempts", row.id, attempts)
+            return {"id": row.id, "attempts": attempts, "parked_at": datetime.now(timezone.utc)}
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+        return {
+            "id": row.id,
+            "attempts": attempts,
+            "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay)
+        }
+
+    async def _prune(self) -> None:
+        async with session_scope() as session:
+            await session.execute(delete(OutboxEvent).where(OutboxEvent.sent_at < func.now() - self.retention))
+            await session.commit()
+        self.last_pruned = time.monotonic()
+
+    async def _run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            try:
+                relayed = await self.relay_batch()
+                if time.monotonic() - self.last_pruned >= PRUNE_INTERVAL_SECONDS:
+                    await self._prune()
+            except Exception:
+                self.failures += 1
+                logger.exception("Relaying outbox events failed")
+                relayed = 0
+            if relayed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+outbox_relay = OutboxRelay()
+metrics.register("outbox", outbox_relay.stats)
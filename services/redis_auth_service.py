@@ -1,16 +1,82 @@
-from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 import jwt
 from fastapi import status
 from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from ..config import security_settings
+from ..core.token_cache import VerifiedTokenCache, token_cache
 from ..utils.exceptions import AppException
 from ..utils.errors import ErrorCode
 
+REVOCATION_CHANNEL = "auth:revocations"
+GENERATION_CHANNEL = "auth:generations"
+TOKEN_GENERATIONS_KEY = "auth:token_generations"
+REFRESH_TOKEN_PREFIX = "auth:refresh:"
+REFRESH_FAMILY_PREFIX = "auth:refresh_family:"
+REFRESH_TOKEN_TTL = timedelta(days=security_settings.REFRESH_TOKEN_TTL_DAYS)
+
+# Rotates a refresh token in one round trip. Every token of a login session shares a family whose key points at
+# the only token that may still be used; presenting any other token of the family is treated as theft and ends
+# the whole session. Rotated tokens keep their entry until it expires so that such reuse can be recognised.
+_ROTATE_REFRESH_TOKEN_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+    return {'invalid'}
+end
+local entry = cjson.decode(raw)
+local family_key = ARGV[1] .. entry.family
+local current = redis.call('GET', family_key)
+if not current then
+    return {'invalid'}
+end
+if current ~= ARGV[2] then
+    redis.call('DEL', family_key)
+    return {'reused'}
+end
+local generation = tonumber(redis.call('HGET', KEYS[2], entry.user.id) or '0')
+if generation > entry.gen then
+    redis.call('DEL', family_key)
+    return {'invalid'}
+end
+redis.call('SET', ARGV[3] .. ARGV[4], raw, 'EX', ARGV[5])
+redis.call('SET', family_key, ARGV[4], 'EX', ARGV[5])
+return {'ok', raw}
+"""
+
+
+def _refresh_token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 class RedisAuthService:
-    def __init__(self, redis: aioredis.Redis):
+    def __init__(self, redis: aioredis.Redis, cache: VerifiedTokenCache = token_cache):
         self.redis = redis
+        self.cache = cache
+
+    async def token_revoked(self, token_data: dict) -> bool:
+        user_id: str = token_data["user"]["id"]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(token_data["jti"])
+            pipe.hget(TOKEN_GENERATIONS_KEY, user_id)
+            blacklisted, generation = await pipe.execute()
+
+        current_generation = int(generation or 0)
+        self.cache.set_generation(user_id, current_generation)
+        return bool(blacklisted) or token_data.get("gen", 0) < current_generation
+
+    async def get_token_generation(self, user_id: UUID) -> int:
+        return int(await self.redis.hget(TOKEN_GENERATIONS_KEY, str(user_id)) or 0)
 
-    async def token_blacklisted(self, token_jti: str) -> bool:
-        return await self.redis.get(token_jti) is not None
+    async def revoke_all_tokens(self, user_id: UUID) -> None:
+        # One counter per user replaces a blacklist entry for every outstanding token
+        generation: int = await self.redis.hincrby(TOKEN_GENERATIONS_KEY, str(user_id), 1)
+        await self.redis.publish(GENERATION_CHANNEL, f"{user_id}:{generation}")
+        self.cache.set_generation(str(user_id), generation)
 
     async def revoke_token(self ,token_data: dict):
         try:
@@ -25,10 +91,81 @@ class RedisAuthService:
             now_datetime = datetime.now(timezone.utc)
             expiry_seconds = int((expiry_datetime - now_datetime).total_seconds())
             if expiry_seconds > 0:
-                await self.redis.setex(token_data["jti"], expiry_seconds, "revoked")
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.setex(token_data["jti"], expiry_seconds, "revoked")
+                    pipe.publish(REVOCATION_CHANNEL, token_data["jti"])
+                    await pipe.execute()
+                self.cache.evict_jti(token_data["jti"])
         except jwt.PyJWTError:
             raise AppException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 code=ErrorCode.TOKEN_REVOKE_FAILED,
                 message="Impossible to revoke token"
-            )
\ No newline at end of file
+            )
+
+    async def issue_refresh_token(self, user_claims: dict, generation: int) -> str:
+        token = secrets.token_urlsafe(32)
+        token_hash = _refresh_token_hash(token)
+        family = str(uuid.uuid4())
+        entry = json.dumps({"family": family, "user": user_claims, "gen": generation})
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(REFRESH_TOKEN_PREFIX + token_hash, entry, ex=REFRESH_TOKEN_TTL)
+            pipe.set(REFRESH_FAMILY_PREFIX + family, token_hash, ex=REFRESH_TOKEN_TTL)
+            await pipe.execute()
+        return token
+
+    async def rotate_refresh_token(self, token: str) -> tuple[dict, int, str]:
+        token_hash = _refresh_token_hash(token)
+        new_token = secrets.token_urlsafe(32)
+        result = await self.redis.eval(
+            _ROTATE_REFRESH_TOKEN_SCRIPT,
+            2,
+            REFRESH_TOKEN_PREFIX + token_hash,
+            TOKEN_GENERATIONS_KEY,
+            REFRESH_FAMILY_PREFIX,
+            token_hash,
+            REFRESH_TOKEN_PREFIX,
+            _refresh_token_hash(new_token),
+            int(REFRESH_TOKEN_TTL.total_seconds()),
+        )
+
+        if result[0] == "reused":
+            raise AppException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                code=ErrorCode.REFRESH_TOKEN_REUSED,
+                message="Refresh token was already used, please log in again"
+            )
+        if result[0] != "ok":
+            raise AppException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                code=ErrorCode.REFRESH_TOKEN_INVALID,
+                message="Invalid refresh token"
+            )
+        entry: dict = json.loads(result[1])
+        return entry["user"], entry["gen"], new_token
+
+    async def revoke_refresh_token(self, token: str) -> None:
+        raw = await self.redis.get(REFRESH_TOKEN_PREFIX + _refresh_token_hash(token))
+        if raw is not None:
+            await self.redis.delete(REFRESH_FAMILY_PREFIX + json.loads(raw)["family"])
+
+    async def listen_for_revocations(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL, GENERATION_CHANNEL)
+                # Revocations published while we were not subscribed may still sit in the cache
+                self.cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    if message["channel"] == GENERATION_CHANNEL:
+                        user_id, generation = message["data"].rsplit(":", 1)
+                        self.cache.set_generation(user_id, int(generation))
+                    else:
+                        self.cache.evict_jti(message["data"])
+            except RedisError:
+                self.cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
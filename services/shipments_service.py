@@ -1,40 +1,134 @@
+import csv
+import io
 from datetime import datetime, timezone
-from typing import List
-from uuid import UUID
+from typing import Any, AsyncIterator, Sequence
+from uuid import UUID, uuid4
 
-from fastapi import status, BackgroundTasks
-from sqlmodel import select
+from fastapi import status
+from pydantic import ValidationError
+from sqlalchemy import Row, Select, Update, Uuid, any_, bindparam, cast, func, insert, or_, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlmodel import select
 
-from ..celery_module.worker import send_modified_approval_email_task, send_shipment_created_email_task
-from ..database.schemas.user import UserBase
-from .email_service import EmailService
-from .socket_message_service import SocketMessageService
-from ..database.schemas.shipment import ProgressStatus, ShipmentCreate, ShipmentSummary, ApprovalStatus, ShipmentCreateSimple
-from ..database.models.shipment import Shipment
+from ..database.models.shipment import Shipment, ShipmentTombstone
 from ..database.models.user import User
-from ..utils.exceptions import AppException
+from ..database.schemas.shipment import (
+    ApprovalStatus,
+    ExportFormat,
+    ProgressStatus,
+    ShipmentBulkCreated,
+    ShipmentBulkError,
+    ShipmentBulkResult,
+    ShipmentBulkStatusResult,
+    ShipmentChange,
+    ShipmentChangePage,
+    ShipmentCreate,
+    ShipmentCreateSimple,
+    ShipmentFilter,
+    ShipmentPage,
+    ShipmentRole,
+    ShipmentSummary,
+)
+from ..database.schemas.user import NotificationRecipient
+from ..database.session import session_scope
 from ..utils.errors import ErrorCode
+from ..utils.exceptions import AppException
+from ..utils.pagination import decode_change_cursor, decode_cursor, encode_change_cursor, encode_cursor, keyset_after
+from .notification_service import BULK_MODIFIED_APPROVAL, MODIFIED_APPROVAL, SHIPMENT_CREATED
+from .outbox_relay import outbox_relay, shipment_batch_outbox_event, shipment_outbox_event
+
+Buyer = aliased(User, name="buyer")
+Seller = aliased(User, name="seller")
+
+EXPORT_CHUNK_SIZE = 1000
+BULK_CREATE_LIMIT = 500
+BULK_UPDATE_LIMIT = 500
+NIL_UUID = UUID(int=0)
 
 
 class ShipmentService:
-    def __init__(self, session: AsyncSession, socket_service: SocketMessageService, email_service: EmailService,
-                 background_tasks: BackgroundTasks):
+    def __init__(self, session: AsyncSession):
         self.session = session
-        self.socket_service = socket_service
-        self.email_service = email_service
-        self.background_tasks = background_tasks
-
-    async def get_all_shipments(self) -> list[ShipmentSummary]:
-        result = await self.session.execute(select(Shipment))
-        shipments = result.scalars().all()
-        if not shipments:
-            raise AppException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                code=ErrorCode.SHIPMENT_NOT_FOUND,
-                message="There are no shipments found"
-            )
-        return [ShipmentSummary.model_validate(shipment) for shipment in shipments]
+
+    async def get_all_shipments(self, filters: ShipmentFilter, limit: int, cursor: str | None) -> ShipmentPage:
+        query = self._apply_filters(self._summary_select(), filters)
+        return await self._fetch_page(query, limit, cursor)
+
+    async def export_shipments(self, filters: ShipmentFilter, export_format: ExportFormat) -> AsyncIterator[str]:
+        query = (
+            self._apply_filters(self._summary_select(), filters)
+            .order_by(Shipment.estimated_delivery, Shipment.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        if export_format == ExportFormat.CSV:
+            yield self._encode_csv_header()
+
+        # The request session is closed once the handler returns, so the stream holds its own
+        async with session_scope() as session:
+            result = await session.stream(query)
+            async for rows in result.partitions():
+                if export_format == ExportFormat.CSV:
+                    yield self._encode_csv_chunk(rows)
+                else:
+                    yield self._encode_ndjson_chunk(rows)
+
+    @staticmethod
+    def _encode_ndjson_chunk(rows: Sequence[Row]) -> str:
+        return "".join(ShipmentSummary.model_validate(row).model_dump_json(by_alias=True) + "\n" for row in rows)
+
+    @staticmethod
+    def _encode_csv_header() -> str:
+        buffer = io.StringIO()
+        fields = ShipmentSummary.model_fields
+        csv.writer(buffer).writerow(field.alias or name for name, field in fields.items())
+        return buffer.getvalue()
+
+    @staticmethod
+    def _encode_csv_chunk(rows: Sequence[Row]) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(ShipmentSummary.model_validate(row).model_dump(mode="json").values())
+        return buffer.getvalue()
+
+    async def get_changes(self, since: str | None, limit: int) -> ShipmentChangePage:
+        after = decode_change_cursor(since) if since is not None else (0, NIL_UUID)
+        # Rows are ordered by the id of the transaction that wrote them. Only transactions older than every
+        # running one are final, so the feed stops there instead of skipping a slow commit with a lower id.
+        horizon: int = await self.session.scalar(select(func.txid_snapshot_xmin(func.txid_current_snapshot())))
+
+        changed_key = (Shipment.change_txid, Shipment.id)
+        changed = await self.session.execute(
+            self._summary_select()
+            .add_columns(Shipment.change_txid)
+            .where(keyset_after(changed_key, after), Shipment.change_txid < horizon)
+            .order_by(*changed_key)
+            .limit(limit + 1)
+        )
+        deleted_key = (ShipmentTombstone.change_txid, ShipmentTombstone.id)
+        deleted = await self.session.execute(
+            select(ShipmentTombstone.id, ShipmentTombstone.change_txid)
+            .where(keyset_after(deleted_key, after), ShipmentTombstone.change_txid < horizon)
+            .order_by(*deleted_key)
+            .limit(limit + 1)
+        )
+
+        entries = sorted(
+            [((row.change_txid, row.id), ShipmentChange(id=row.id, shipment=ShipmentSummary.model_validate(row)))
+             for row in changed] +
+            [((row.change_txid, row.id), ShipmentChange(id=row.id, deleted=True)) for row in deleted],
+            key=lambda entry: entry[0]
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        position = entries[-1][0] if has_more else max(after, (horizon, NIL_UUID))
+        return ShipmentChangePage(
+            changes=[change for _, change in entries],
+            next_cursor=encode_change_cursor(*position),
+            has_more=has_more
+        )
 
     async def get_shipment_by_id(self, shipment_id: UUID) -> Shipment:
         shipment: Shipment | None = await self.session.get(Shipment, shipment_id)
@@ -47,31 +141,175 @@ class ShipmentService:
             )
         return shipment
 
-    async def get_shipments_by_user_id(self, user_id) -> List[Shipment]:
-        shipments = await self.session.execute(select(Shipment).where(Shipment.user_id == user_id))
-        shipments_list = shipments.scalars().all()
-        return list(shipments_list)
+    async def get_user_shipments(self, user_id: UUID, role: ShipmentRole, limit: int,
+                                 cursor: str | None) -> ShipmentPage:
+        if role == ShipmentRole.BUYER:
+            query = self._page_query(self._summary_select().where(Shipment.buyer_id == user_id), limit, cursor)
+        elif role == ShipmentRole.SELLER:
+            query = self._page_query(self._summary_select().where(Shipment.seller_id == user_id), limit, cursor)
+        else:
+            # Each side walks its own (<role>_id, estimated_delivery, id) index; only 2 * limit rows get merged
+            purchases = self._page_query(self._summary_select().where(Shipment.buyer_id == user_id), limit, cursor)
+            sales = self._page_query(self._summary_select().where(Shipment.seller_id == user_id), limit, cursor)
+            merged = union_all(
+                select(purchases.subquery()),
+                select(sales.subquery())
+            ).subquery()
+            query = select(merged).order_by(merged.c.estimated_delivery, merged.c.id).limit(limit + 1)
+
+        rows = (await self.session.execute(query)).all()
+        return self._build_page(rows, limit)
 
     async def create_shipment(self, shipment_data_simple: ShipmentCreateSimple,
                               user_id: UUID) -> ShipmentSummary:
-        shipment_data: ShipmentCreate = await self.map_simple_to_create(shipment_data_simple, user_id)
-        shipment_data_valid = self._validate_shipment_create(shipment_data)
-        clean_data = shipment_data_valid.model_dump()
-        shipment = Shipment.model_validate(clean_data)
-        self.session.add(shipment)
+        shipment_data = self._validate_shipment_create(ShipmentCreate(
+            product=shipment_data_simple.product,
+            progress=shipment_data_simple.progress,
+            estimated_delivery=shipment_data_simple.estimated_delivery,
+            seller_id=user_id,
+        ))
+        row = (await self.session.execute(
+            self._shipment_insert(shipment_data, shipment_data_simple.buyer_username)
+        )).one_or_none()
+        if row is None:
+            raise AppException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                code=ErrorCode.USER_NOT_FOUND,
+                message=f"User with username: '{shipment_data_simple.buyer_username}' not found",
+                meta={"username": shipment_data_simple.buyer_username}
+            )
+
+        shipment_summary = ShipmentSummary.model_validate(row)
+        # Side effects are committed with the shipment and published by the outbox relay
+        self.session.add(shipment_outbox_event(SHIPMENT_CREATED, shipment_summary, *self._parties(row)))
         await self.session.commit()
-        await self.session.refresh(shipment)
-        shipment_summary: ShipmentSummary = ShipmentSummary.model_validate(shipment)
-        await self.socket_service.add_pending_purchase_message(shipment.buyer_id, shipment_summary)
-        send_shipment_created_email_task.delay(
-            shipment_summary.model_dump(),
-            shipment.seller.model_dump(),
-            shipment.buyer.model_dump()
-        )
+        outbox_relay.wake()
         return shipment_summary
 
+    async def create_shipments(self, raw_items: list[dict[str, Any]], seller_id: UUID) -> ShipmentBulkResult:
+        if len(raw_items) > BULK_CREATE_LIMIT:
+            raise AppException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                code=ErrorCode.SHIPMENT_BULK_TOO_LARGE,
+                message=f"At most {BULK_CREATE_LIMIT} shipments can be created at once",
+                meta={"count": len(raw_items)}
+            )
+
+        errors: list[ShipmentBulkError] = []
+        items: list[tuple[int, ShipmentCreateSimple]] = []
+        for index, raw_item in enumerate(raw_items):
+            try:
+                items.append((index, ShipmentCreateSimple.model_validate(raw_item)))
+            except ValidationError as e:
+                errors.append(self._invalid_item(index, e))
+
+        # Every party of the batch, the seller included, in one query
+        parties = (await self.session.execute(
+            select(User.id, User.username, User.full_name, User.email, User.notification_mode)
+            .where(or_(User.username.in_({item.buyer_username for _, item in items}), User.id == seller_id))
+        )).all()
+        seller = next((party for party in parties if party.id == seller_id), None)
+        if seller is None:
+            raise AppException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                code=ErrorCode.USER_NOT_FOUND,
+                message="No authenticated user found"
+            )
+        buyers = {party.username: party for party in parties}
+
+        accepted = []
+        for index, item in items:
+            buyer = buyers.get(item.buyer_username)
+            if buyer is None:
+                errors.append(ShipmentBulkError(
+                    index=index,
+                    code=ErrorCode.USER_NOT_FOUND,
+                    message=f"User with username: '{item.buyer_username}' not found"
+                ))
+                continue
+            if buyer.id == seller_id:
+                errors.append(ShipmentBulkError(
+                    index=index,
+                    code=ErrorCode.SHIPMENT_SELF_PURCHASE,
+                    message="Buyer and seller cannot be the same user"
+                ))
+                continue
+            try:
+                shipment_data = self._validate_shipment_create(ShipmentCreate(
+                    product=item.product,
+                    progress=item.progress,
+                    estimated_delivery=item.estimated_delivery,
+                    buyer_id=buyer.id,
+                    seller_id=seller_id,
+                ))
+                shipment = Shipment.model_validate(shipment_data.model_dump())
+            except AppException as e:
+                errors.append(ShipmentBulkError(index=index, code=e.detail["code"], message=e.detail["message"]))
+                continue
+            except ValidationError as e:
+                errors.append(self._invalid_item(index, e))
+                continue
+            accepted.append((index, buyer, shipment))
+
+        created: list[ShipmentBulkCreated] = []
+        if accepted:
+            rows = (await self.session.execute(
+                insert(Shipment)
+                .values([
+                    {
+                        "id": shipment.id,
+                        "product": shipment.product,
+                        "progress": shipment.progress,
+                        "estimated_delivery": shipment.estimated_delivery,
+                        "approval_status": shipment.approval_status,
+                        "buyer_id": shipment.buyer_id,
+                        "seller_id": shipment.seller_id,
+                    }
+                    for _, _, shipment in accepted
+                ])
+                .returning(
+                    Shipment.id, Shipment.product, Shipment.progress,
+                    Shipment.estimated_delivery, Shipment.approval_status
+                )
+            )).all()
+            # RETURNING does not promise VALUES order, rows are matched back by their generated id
+            inserted = {row.id: row for row in rows}
+            for index, buyer, shipment in accepted:
+                row = inserted[shipment.id]
+                summary = ShipmentSummary(
+                    id=row.id,
+                    product=row.product,
+                    progress=row.progress,
+                    estimated_delivery=row.estimated_delivery,
+                    approval_status=row.approval_status,
+                    buyer_username=buyer.username,
+                    seller_username=seller.username,
+                )
+                created.append(ShipmentBulkCreated(index=index, shipment=summary))
+                self.session.add(shipment_outbox_event(SHIPMENT_CREATED, summary, seller, buyer))
+            await self.session.commit()
+            outbox_relay.wake()
+
+        return ShipmentBulkResult(created=created, errors=sorted(errors, key=lambda error: error.index))
+
+    @staticmethod
+    def _invalid_item(index: int, error: ValidationError) -> ShipmentBulkError:
+        return ShipmentBulkError(
+            index=index,
+            code=ErrorCode.SHIPMENT_INVALID_DATA,
+            message="; ".join(
+                f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" if detail["loc"] else detail["msg"]
+                for detail in error.errors()
+            )
+        )
+
     async def delete_shipment(self, shipment_id: UUID) -> None:
         shipment = await self.get_shipment_by_id(shipment_id)
+        self.session.add(ShipmentTombstone(
+            id=shipment.id,
+            buyer_id=shipment.buyer_id,
+            seller_id=shipment.seller_id
+        ))
         await self.session.delete(shipment)
         await self.session.commit()
 
@@ -84,28 +322,195 @@ class ShipmentService:
                 code=ErrorCode.SHIPMENT_INVALID_STATUS_UPDATE,
                 message="Cannot update approval status to 'pending'"
             )
-        shipment: Shipment | None = await self.session.get(Shipment, shipment_id)
-
-        if not shipment:
+        row = (await self.session.execute(
+            self._approval_update(approval_status, Shipment.id == shipment_id)
+        )).one_or_none()
+        if row is None:
             raise AppException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 code=ErrorCode.SHIPMENT_NOT_FOUND,
                 message=f"Shipment with id '{shipment_id}' not found"
             )
 
-        shipment.approval_status = approval_status
-        self.session.add(shipment)
+        shipment_summary = ShipmentSummary.model_validate(row)
+        self.session.add(shipment_outbox_event(MODIFIED_APPROVAL, shipment_summary, *self._parties(row)))
         await self.session.commit()
-        await self.session.refresh(shipment)
-        shipment_summary: ShipmentSummary = ShipmentSummary.model_validate(shipment)
-        await self.socket_service.update_sale_message(shipment.seller_id, shipment_summary)
-        send_modified_approval_email_task.delay(
-            shipment_summary.model_dump(),
-            shipment.seller.model_dump(),
-            shipment.buyer.model_dump()
-        )
+        outbox_relay.wake()
         return shipment_summary
 
+    async def update_shipments_approval_status(self, ids: list[UUID], approval_status: ApprovalStatus,
+                                               buyer_id: UUID) -> ShipmentBulkStatusResult:
+        if approval_status == ApprovalStatus.PENDING:
+            raise AppException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                code=ErrorCode.SHIPMENT_INVALID_STATUS_UPDATE,
+                message="Cannot update approval status to 'pending'"
+            )
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > BULK_UPDATE_LIMIT:
+            raise AppException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                code=ErrorCode.SHIPMENT_BULK_TOO_LARGE,
+                message=f"At most {BULK_UPDATE_LIMIT} shipments can be updated at once",
+                meta={"count": len(ids)}
+            )
+
+        # Shipments of other buyers are filtered by the UPDATE itself and reported like missing ones
+        rows = (await self.session.execute(self._approval_update(
+            approval_status,
+            Shipment.id == any_(bindparam("ids", ids, type_=ARRAY(Uuid))),
+            Shipment.buyer_id == buyer_id
+        ))).all()
+        updated = {row.id: row for row in rows}
+
+        # One event per seller, so each counterparty gets a single push and a single email for the whole batch
+        by_seller: dict[UUID, list[Row]] = {}
+        for row in rows:
+            by_seller.setdefault(row.seller_id, []).append(row)
+        for seller_rows in by_seller.values():
+            seller, buyer = self._parties(seller_rows[0])
+            summaries = [ShipmentSummary.model_validate(row) for row in seller_rows]
+            self.session.add(shipment_batch_outbox_event(BULK_MODIFIED_APPROVAL, summaries, seller, buyer))
+        await self.session.commit()
+        if rows:
+            outbox_relay.wake()
+
+        return ShipmentBulkStatusResult(
+            updated=[ShipmentSummary.model_validate(updated[id]) for id in ids if id in updated],
+            not_found=[id for id in ids if id not in updated]
+        )
+
+    @staticmethod
+    def _approval_update(approval_status: ApprovalStatus, *criteria) -> Update:
+        # Returns the summary and both parties joined from user, nothing has to be loaded afterwards
+        return (
+            update(Shipment)
+            .where(Buyer.id == Shipment.buyer_id, Seller.id == Shipment.seller_id, *criteria)
+            .values(approval_status=approval_status, change_txid=func.txid_current())
+            .returning(
+                Shipment.id,
+                Shipment.product,
+                Shipment.progress,
+                Shipment.estimated_delivery,
+                Shipment.approval_status,
+                *ShipmentService._party_columns(Buyer, "buyer"),
+                *ShipmentService._party_columns(Seller, "seller"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _shipment_insert(shipment: ShipmentCreate, buyer_username: str) -> Select:
+        # The buyer id is resolved by the INSERT ... SELECT itself, no row comes back when the username is unknown.
+        # RETURNING only sees the new row, the usernames and emails are joined on top of it.
+        columns = Shipment.__table__.c
+        inserted = (
+            insert(Shipment)
+            .from_select(
+                ["id", "product", "progress", "estimated_delivery", "approval_status", "buyer_id", "seller_id"],
+                select(
+                    # Casts, since untyped parameters in a SELECT list would be read as text
+                    cast(uuid4(), columns.id.type),
+                    cast(shipment.product, columns.product.type),
+                    cast(shipment.progress, columns.progress.type),
+                    cast(shipment.estimated_delivery, columns.estimated_delivery.type),
+                    cast(shipment.approval_status, columns.approval_status.type),
+                    User.id,
+                    cast(shipment.seller_id, columns.seller_id.type),
+                ).where(User.username == buyer_username)
+            )
+            .returning(*columns)
+            .cte("inserted")
+        )
+        return (
+            select(
+                inserted.c.id,
+                inserted.c.product,
+                inserted.c.progress,
+                inserted.c.estimated_delivery,
+                inserted.c.approval_status,
+                *ShipmentService._party_columns(Buyer, "buyer"),
+                *ShipmentService._party_columns(Seller, "seller"),
+            )
+            .select_from(inserted)
+            .join(Buyer, Buyer.id == inserted.c.buyer_id)
+            .join(Seller, Seller.id == inserted.c.seller_id)
+        )
+
+    @staticmethod
+    def _party_columns(user, prefix: str) -> list:
+        return [
+            user.id.label(f"{prefix}_id"),
+            user.username.label(f"{prefix}_username"),
+            user.full_name.label(f"{prefix}_full_name"),
+            user.email.label(f"{prefix}_email"),
+            user.notification_mode.label(f"{prefix}_notification_mode"),
+        ]
+
+    @staticmethod
+    def _parties(row: Row) -> tuple[NotificationRecipient, NotificationRecipient]:
+        columns = row._mapping
+        seller, buyer = (
+            NotificationRecipient(
+                id=columns[f"{prefix}_id"],
+                username=columns[f"{prefix}_username"],
+                full_name=columns[f"{prefix}_full_name"],
+                email=columns[f"{prefix}_email"],
+                notification_mode=columns[f"{prefix}_notification_mode"],
+            )
+            for prefix in ("seller", "buyer")
+        )
+        return seller, buyer
+
+    @staticmethod
+    def _summary_select() -> Select:
+        # Usernames come from the joins so listing never touches the selectin relationships
+        return (
+            select(
+                Shipment.id,
+                Shipment.product,
+                Shipment.progress,
+                Shipment.estimated_delivery,
+                Shipment.approval_status,
+                Buyer.username.label("buyer_username"),
+                Seller.username.label("seller_username"),
+            )
+            .join(Buyer, Buyer.id == Shipment.buyer_id)
+            .join(Seller, Seller.id == Shipment.seller_id)
+        )
+
+    @staticmethod
+    def _apply_filters(query: Select, filters: ShipmentFilter) -> Select:
+        if filters.progress is not None:
+            query = query.where(Shipment.progress == filters.progress)
+        if filters.approval_status is not None:
+            query = query.where(Shipment.approval_status == filters.approval_status)
+        if filters.delivery_from is not None:
+            query = query.where(Shipment.estimated_delivery >= filters.delivery_from)
+        if filters.delivery_to is not None:
+            query = query.where(Shipment.estimated_delivery < filters.delivery_to)
+        return query
+
+    async def _fetch_page(self, query: Select, limit: int, cursor: str | None) -> ShipmentPage:
+        rows = (await self.session.execute(self._page_query(query, limit, cursor))).all()
+        return self._build_page(rows, limit)
+
+    @staticmethod
+    def _page_query(query: Select, limit: int, cursor: str | None) -> Select:
+        sort_key = (Shipment.estimated_delivery, Shipment.id)
+        if cursor is not None:
+            query = query.where(keyset_after(sort_key, decode_cursor(cursor)))
+        # One extra row tells whether another page exists
+        return query.order_by(*sort_key).limit(limit + 1)
+
+    @staticmethod
+    def _build_page(rows: Sequence[Row], limit: int) -> ShipmentPage:
+        items = [ShipmentSummary.model_validate(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(items[-1].estimated_delivery, items[-1].id)
+        return ShipmentPage(items=items, next_cursor=next_cursor)
+
     def _validate_shipment_create(self, shipment_data: ShipmentCreate) -> ShipmentCreate:
         valid_shipment = shipment_data.model_dump(exclude_none=True)
         delivery_progress: str = valid_shipment.get("progress")
@@ -130,24 +535,3 @@ class ShipmentService:
             )
 
         return ShipmentCreate.model_validate(valid_shipment)
-
-    async def map_simple_to_create(self, shipment_data: ShipmentCreateSimple, seller_id: UUID) -> ShipmentCreate:
-        return ShipmentCreate(
-            product=shipment_data.product,
-            progress=shipment_data.progress,
-            estimated_delivery=shipment_data.estimated_delivery,
-            buyer_id=await self._find_user_id_by_username(shipment_data.buyer_username),
-            seller_id=seller_id,
-        )
-
-    async def _find_user_id_by_username(self, username: str) -> UUID:
-        find_by_username = select(User.id).where(User.username == username)
-        id = (await self.session.execute(find_by_username)).scalars().one_or_none()
-        if id is None:
-            raise AppException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                code=ErrorCode.USER_NOT_FOUND,
-                message=f"User with username: '{username}' not found",
-                meta={"username": username}
-            )
-        return id
\ No newline at end of file
@@ -1,33 +1,27 @@
 from uuid import UUID
 
-from fastapi.encoders import jsonable_encoder
-
 from ..utils.socket_manager import socket_manager, SocketConnectionManager
 from ..database.schemas.shipment import ShipmentSummary
 
 
+def _encode_event(event_type: str, shipment_summary: ShipmentSummary | list[ShipmentSummary]) -> str:
+    # Serialized once here; every socket of the user receives the same string
+    if isinstance(shipment_summary, list):
+        payload = "[" + ",".join(summary.model_dump_json(by_alias=True) for summary in shipment_summary) + "]"
+    else:
+        payload = shipment_summary.model_dump_json(by_alias=True)
+    return f'{{"type":"{event_type}","payload":{payload}}}'
+
+
 class SocketMessageService:
     def __init__(self, manager: SocketConnectionManager = socket_manager):
         self.manager = manager
 
-    async def update_sale_message(self, seller_id: UUID, shipment_summary: ShipmentSummary) -> None:
-        message = {
-            "type": "SALE_UPDATE",
-            "payload": jsonable_encoder(shipment_summary)
-        }
-        await self.manager.send_message(seller_id, message)
-
-    async def add_pending_purchase_message(self, buyer_id: UUID, shipment_summary: ShipmentSummary) -> None:
-        message = {
-            "type": "PURCHASE_ADD",
-            "payload": jsonable_encoder(shipment_summary)
-        }
-        await self.manager.send_message(buyer_id, message)
-
-    async def heartbeat(self, user_id: UUID) -> None:
-        message = {
-            "type": "PONG"
-        }
-        await self.manager.send_message(user_id, message)
+    async def send_shipment_events(self,
+                                   events: list[tuple[UUID, str, ShipmentSummary | list[ShipmentSummary]]]) -> None:
+        await self.manager.send_events([
+            (user_id, _encode_event(event_type, shipment_summary))
+            for user_id, event_type, shipment_summary in events
+        ])
 
-socket_message_service = SocketMessageService()
\ No newline at end of file
+socket_message_service = SocketMessageService()
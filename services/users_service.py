@@ -3,32 +3,31 @@ from typing import Any
 from uuid import UUID
 
 from itsdangerous import SignatureExpired
-from passlib.context import CryptContext
-from fastapi import status, BackgroundTasks
+from fastapi import status
 from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, Select
+from sqlalchemy import select, or_, Select, update
 from sqlalchemy.orm import selectinload
 
+from ..core.security import password_hasher
 from ..celery_module.worker import send_verification_email_task
 from ..celery_module.worker import send_password_reset_email_task
 from ..utils.utils import decode_url_safe_token, generate_url_safe_token, generate_access_token
-from .email_service import EmailService
+from .redis_auth_service import RedisAuthService
 from ..database.models.user import User
 from ..database.models.shipment import Shipment
 from ..database.schemas.user import UserCreate, UserBase, UserPlain
+from ..database.schemas.common import TokenPair
+from ..database.models.enums import NotificationMode
 from ..utils.exceptions import AppException
 from ..utils.errors import ErrorCode
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
-def hash_password(password: str) -> str:
-    return password_context.encrypt(password)
-
-
-def verify_password(password: str, hashed_password: str) -> bool:
-    return password_context.verify(password, hashed_password)
+async def verify_password(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await password_hasher.verify(password, hashed_password)
 
 
 async def get_one_or_none(select: Select, session: AsyncSession):
@@ -37,10 +36,9 @@ async def get_one_or_none(select: Select, session: AsyncSession):
 
 
 class UserService():
-    def __init__(self, session: AsyncSession, email_service: EmailService, background_tasks: BackgroundTasks):
+    def __init__(self, session: AsyncSession, redis_auth_service: RedisAuthService):
         self.session = session
-        self.email_service = email_service
-        self.background_tasks = background_tasks
+        self.redis_auth_service = redis_auth_service
 
     async def register_user(self, user_data: UserCreate) -> str:
         user: User = User(
@@ -64,7 +62,7 @@ class UserService():
                 meta={"username": user.username},
             )
 
-        user.hashed_password = hash_password(user_data.password)
+        user.hashed_password = await hash_password(user_data.password)
         self.session.add(user)
         await self.session.commit()
         await self.session.refresh(user)
@@ -73,7 +71,7 @@ class UserService():
 
         return str(user.id)
 
-    async def token(self, login, password) -> str:
+    async def token(self, login, password) -> TokenPair:
         find_by_email_or_username = select(User).where(or_(User.email == login, User.username == login))
         user = await get_one_or_none(find_by_email_or_username, self.session)
         print(user, login)
@@ -94,7 +92,8 @@ class UserService():
                 meta={"email": user.email},
             )
 
-        if not verify_password(password, user.hashed_password):
+        verified, updated_hash = await verify_password(password, user.hashed_password)
+        if not verified:
             raise AppException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 code=ErrorCode.WRONG_PASSWORD,
@@ -102,18 +101,34 @@ class UserService():
                 meta={"email": user.email},
             )
 
-        token = generate_access_token(
-            data={
-                "user": {
-                    "id": str(user.id),
-                    "username": user.username,
-                    "email": user.email,
-                }
-            },
+        user_claims = {
+            "id": str(user.id),
+            "username": user.username,
+            "full_name": user.full_name,
+            "email": user.email,
+        }
+        generation = await self.redis_auth_service.get_token_generation(user.id)
+        token = TokenPair(
+            access_token=generate_access_token(data={"user": user_claims, "gen": generation}),
+            refresh_token=await self.redis_auth_service.issue_refresh_token(user_claims, generation),
         )
 
+        # Transparently move hashes made with an old bcrypt cost to the configured one
+        if updated_hash is not None:
+            user.hashed_password = updated_hash
+            self.session.add(user)
+            await self.session.commit()
+
         return token
 
+    async def refresh_token(self, refresh_token: str) -> TokenPair:
+        # Keeping a session alive costs one Redis script call and an HS256 signature, no password check
+        user_claims, generation, new_refresh_token = await self.redis_auth_service.rotate_refresh_token(refresh_token)
+        return TokenPair(
+            access_token=generate_access_token(data={"user": user_claims, "gen": generation}),
+            refresh_token=new_refresh_token,
+        )
+
     async def find_by_id(self, id: UUID) -> User:
         query = select(User).where(User.id == id).options(
             selectinload(User.purchases).selectinload(Shipment.seller),
@@ -248,9 +263,17 @@ class UserService():
     async def reset_password(self, *, token: str, new_pass: str) -> None:
         data: dict | None = decode_url_safe_token(token, timedelta(minutes=10), salt="password-reset-token")
         user: User = await self.find_by_email(data['email'])
-        user.hashed_password = hash_password(new_pass)
+        user_id = user.id
+        user.hashed_password = await hash_password(new_pass)
         self.session.add(user)
         await self.session.commit()
+        await self.redis_auth_service.revoke_all_tokens(user_id)
+
+    async def set_notification_mode(self, user_id: UUID, notification_mode: NotificationMode) -> None:
+        await self.session.execute(
+            update(User).where(User.id == user_id).values(notification_mode=notification_mode)
+        )
+        await self.session.commit()
 
     def _send_email_verification(self, user: UserPlain):
         token = generate_url_safe_token({
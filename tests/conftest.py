@@ -0,0 +1,18 @@
+import os
+
+# Settings are read at import time, the tests only need them to be present
+for name, value in {
+    "POSTGRES_USERNAME": "test",
+    "POSTGRES_SERVER": "localhost",
+    "POSTGRES_PORT": "5432",
+    "DB_NAME": "test",
+    "JWT_SECRET": "0123456789abcdef0123456789abcdef",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+    "MAIL_FROM_NAME": "test",
+    "APP_NAME": "test",
+    "APP_SERVER_DOMAIN": "localhost",
+    "APP_CLIENT_DOMAIN": "localhost",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import fakeredis
+
+from ..utils.socket_manager import INBOX_PREFIX, RESYNC_FRAME, SocketConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+    async def close(self, code: int) -> None:
+        pass
+
+
+async def _connect(redis, user_id, last_event_id: str) -> list[str]:
+    manager = SocketConnectionManager(replay_limit=50)
+    manager.redis = redis
+    websocket = FakeWebSocket()
+    connection = await manager.connect(websocket, user_id, last_event_id)
+    await asyncio.sleep(0)
+    connection.close()
+    return websocket.sent
+
+
+async def _append(redis, user_id, count: int, maxlen: int | None = None) -> list[str]:
+    inbox = INBOX_PREFIX + str(user_id)
+    return [
+        await redis.xadd(inbox, {"data": json.dumps({"type": "PING", "n": n})}, maxlen=maxlen, approximate=False)
+        for n in range(count)
+    ]
+
+
+def test_replays_events_after_last_seen_id():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        user_id = uuid4()
+        ids = await _append(redis, user_id, 5)
+        sent = await _connect(redis, user_id, ids[1])
+        assert [json.loads(frame)["id"] for frame in sent] == ids[2:]
+
+    asyncio.run(run())
+
+
+def test_trimmed_last_event_id_forces_resync():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        user_id = uuid4()
+        ids = await _append(redis, user_id, 10, maxlen=3)
+        sent = await _connect(redis, user_id, ids[2])
+        assert sent == [RESYNC_FRAME]
+
+    asyncio.run(run())
+
+
+def test_expired_inbox_forces_resync():
+    async def run():
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        user_id = uuid4()
+        ids = await _append(redis, user_id, 3)
+        await redis.delete(INBOX_PREFIX + str(user_id))
+        sent = await _connect(redis, user_id, ids[1])
+        assert sent == [RESYNC_FRAME]
+
+    asyncio.run(run())
@@ -16,12 +16,20 @@ class ErrorCode(str, Enum):
     TOKEN_INVALID = "AUTH_TOKEN_INVALID"
     TOKEN_MISSING_EXP = "ACCESS_TOKEN_MISSING_EXP"
     TOKEN_REVOKE_FAILED = "ACCESS_TOKEN_REVOKE_FAILED"
+    AUTH_BUSY = "AUTH_BUSY"
+    REFRESH_TOKEN_INVALID = "REFRESH_TOKEN_INVALID"
+    REFRESH_TOKEN_REUSED = "REFRESH_TOKEN_REUSED"
 
     # Shipments
     SHIPMENT_NOT_FOUND = "SHIPMENT_NOT_FOUND"
     SHIPMENT_INVALID_DATE = "SHIPMENT_INVALID_DATE"
     SHIPMENT_INVALID_STATUS_UPDATE = "SHIPMENT_INVALID_STATUS_UPDATE"
     SHIPMENT_SELF_PURCHASE = "SHIPMENT_SELF_PURCHASE"
+    SHIPMENT_BULK_TOO_LARGE = "SHIPMENT_BULK_TOO_LARGE"
+    SHIPMENT_INVALID_DATA = "SHIPMENT_INVALID_DATA"
+
+    # Pagination
+    PAGINATION_INVALID_CURSOR = "PAGINATION_INVALID_CURSOR"
 
     # General
     INTERNAL_SERVER_ERROR = "INTERNAL_SERVER_ERROR"
@@ -1,32 +1,43 @@
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
+from email.message import EmailMessage
+from email.utils import formataddr
+
 from pydantic import NameEmail
 
 from ..config import email_notification_settings
+from .smtp_pool import SMTPConnectionPool
 
 class MailManager():
     def __init__(self):
-        self.fastmail = FastMail(
-            ConnectionConfig(
-                **email_notification_settings.model_dump()
-            )
+        settings = email_notification_settings
+        self.sender = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+        self.pool = SMTPConnectionPool(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+            password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS,
+            validate_certs=settings.VALIDATE_CERTS,
+            timeout=settings.MAIL_TIMEOUT,
+            max_size=settings.SMTP_POOL_SIZE,
+            max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+            keepalive_interval=settings.SMTP_KEEPALIVE_INTERVAL,
+            idle_timeout=settings.SMTP_IDLE_TIMEOUT,
         )
 
     async def send_plain_email(self, recipient_list: list[NameEmail], subject: str, body: str):
-        await self.fastmail.send_message(
-            message=MessageSchema(
-                recipients=recipient_list,
-                subject=subject,
-                body=body,
-                subtype=MessageType.plain
-            )
-        )
+        await self.pool.send_message(self._build_message(recipient_list, subject, body, "plain"))
 
     async def send_html_email(self, recipient_list: list[NameEmail], subject: str, body: str):
-        await self.fastmail.send_message(
-            message=MessageSchema(
-                recipients=recipient_list,
-                subject=subject,
-                body=body,
-                subtype=MessageType.html
-            )
-        )
\ No newline at end of file
+        await self.pool.send_message(self._build_message(recipient_list, subject, body, "html"))
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def _build_message(self, recipient_list: list[NameEmail], subject: str, body: str, subtype: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(formataddr((recipient.name, recipient.email)) for recipient in recipient_list)
+        message["Subject"] = subject
+        message.set_content(body, subtype=subtype)
+        return message
@@ -0,0 +1,56 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from fastapi import status
+from sqlalchemy import ColumnElement, tuple_
+
+from .exceptions import AppException
+from .errors import ErrorCode
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(estimated_delivery: datetime, shipment_id: UUID) -> str:
+    raw = f"{estimated_delivery.isoformat()}|{shipment_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        estimated_delivery, shipment_id = raw.split("|")
+        return datetime.fromisoformat(estimated_delivery), UUID(shipment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise AppException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            code=ErrorCode.PAGINATION_INVALID_CURSOR,
+            message="Invalid pagination cursor",
+            meta={"cursor": cursor}
+        )
+
+
+def encode_change_cursor(change_txid: int, shipment_id: UUID) -> str:
+    return base64.urlsafe_b64encode(f"{change_txid}|{shipment_id}".encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(cursor: str) -> tuple[int, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        change_txid, shipment_id = raw.split("|")
+        return int(change_txid), UUID(shipment_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise AppException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            code=ErrorCode.PAGINATION_INVALID_CURSOR,
+            message="Invalid change feed cursor",
+            meta={"cursor": cursor}
+        )
+
+
+def keyset_after(columns: tuple[ColumnElement[Any], ...], values: tuple[Any, ...]) -> ColumnElement[bool]:
+    # Row comparison keeps the predicate a single range on a matching composite index
+    return tuple_(*columns) > tuple_(*values, types=[column.type for column in columns])
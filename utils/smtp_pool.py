@@ -0,0 +1,147 @@
+import asyncio
+import time
+from email.message import EmailMessage
+from typing import Any
+
+import aiosmtplib
+
+# The session itself is fine after these, only the message was refused
+_MESSAGE_ERRORS = (
+    aiosmtplib.SMTPRecipientsRefused,
+    aiosmtplib.SMTPRecipientRefused,
+    aiosmtplib.SMTPSenderRefused,
+    aiosmtplib.SMTPDataError,
+)
+_CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError, ConnectionError
+)
+# "Service not available, closing transmission channel" can come back as a plain response error
+_SERVICE_CLOSING = 421
+
+
+class PooledSMTPConnection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    def __init__(self, *, hostname: str, port: int, username: str | None, password: str | None,
+                 use_tls: bool, start_tls: bool, validate_certs: bool, timeout: float,
+                 max_size: int, max_messages_per_connection: int,
+                 keepalive_interval: float, idle_timeout: float):
+        self.connect_options: dict[str, Any] = {
+            "hostname": hostname,
+            "port": port,
+            "username": username,
+            "password": password,
+            "use_tls": use_tls,
+            "start_tls": start_tls,
+            "validate_certs": validate_certs,
+            "timeout": timeout,
+        }
+        self.max_messages_per_connection = max_messages_per_connection
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        self.max_size = max_size
+        self.slots = asyncio.Semaphore(max_size)
+        self.idle: list[PooledSMTPConnection] = []
+        self.in_use = 0
+        self.connections_opened = 0
+        self.connections_discarded = 0
+        self.messages_sent = 0
+        self.messages_refused = 0
+
+    async def send_message(self, message: EmailMessage) -> None:
+        async with self.slots:
+            self.in_use += 1
+            try:
+                connection = await self._acquire()
+                try:
+                    await self._send(connection, message)
+                except _CONNECTION_ERRORS:
+                    # The server dropped a pooled session between checks, the message gets one fresh connection
+                    await self._send(await self._connect(), message)
+            finally:
+                self.in_use -= 1
+
+    async def close(self) -> None:
+        idle, self.idle = self.idle, []
+        for connection in idle:
+            await self._discard(connection)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_size": self.max_size,
+            "in_use_connections": self.in_use,
+            "idle_connections": len(self.idle),
+            "connections_opened": self.connections_opened,
+            "connections_discarded": self.connections_discarded,
+            "messages_sent": self.messages_sent,
+            "messages_refused": self.messages_refused,
+        }
+
+    async def _send(self, connection: PooledSMTPConnection, message: EmailMessage) -> None:
+        try:
+            await connection.smtp.send_message(message)
+        except _MESSAGE_ERRORS as e:
+            self.messages_refused += 1
+            if getattr(e, "code", None) == _SERVICE_CLOSING:
+                await self._discard(connection)
+            else:
+                await self._reset(connection)
+            raise
+        except BaseException:
+            await self._discard(connection)
+            raise
+        connection.messages_sent += 1
+        self.messages_sent += 1
+        await self._release(connection)
+
+    async def _reset(self, connection: PooledSMTPConnection) -> None:
+        # RSET drops the half-finished mail transaction so the next message starts clean
+        try:
+            await connection.smtp.rset()
+        except (aiosmtplib.SMTPException, ConnectionError, OSError):
+            await self._discard(connection)
+            return
+        await self._release(connection)
+
+    async def _release(self, connection: PooledSMTPConnection) -> None:
+        connection.last_used = time.monotonic()
+        if connection.messages_sent >= self.max_messages_per_connection:
+            await self._discard(connection)
+        else:
+            self.idle.append(connection)
+
+    async def _acquire(self) -> PooledSMTPConnection:
+        while self.idle:
+            connection = self.idle.pop()
+            idle_for = time.monotonic() - connection.last_used
+            if not connection.smtp.is_connected or idle_for >= self.idle_timeout:
+                await self._discard(connection)
+                continue
+            if idle_for >= self.keepalive_interval:
+                try:
+                    await connection.smtp.noop()
+                except (aiosmtplib.SMTPException, ConnectionError):
+                    await self._discard(connection)
+                    continue
+            return connection
+        return await self._connect()
+
+    async def _connect(self) -> PooledSMTPConnection:
+        smtp = aiosmtplib.SMTP(**self.connect_options)
+        # Connecting also negotiates TLS and logs in, that is the cost the pool amortises
+        await smtp.connect()
+        self.connections_opened += 1
+        return PooledSMTPConnection(smtp)
+
+    async def _discard(self, connection: PooledSMTPConnection) -> None:
+        self.connections_discarded += 1
+        try:
+            if connection.smtp.is_connected:
+                await connection.smtp.quit()
+        except (aiosmtplib.SMTPException, ConnectionError, OSError):
+            connection.smtp.close()
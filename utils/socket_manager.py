@@ -1,29 +1,295 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any
 from typing import List, Dict
 from uuid import UUID
 
 from fastapi import WebSocket
+from redis import asyncio as aioredis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+from starlette import status
+
+from ..config import socket_settings
+from ..core.metrics import metrics
+
+USER_CHANNEL_PREFIX = "ws:user:"
+INBOX_PREFIX = "ws:inbox:"
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_DISCONNECT = "disconnect"
+
+
+def encode_message(message: dict) -> str:
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+PING_FRAME = encode_message({"type": "PING"})
+PONG_FRAME = encode_message({"type": "PONG"})
+RESYNC_FRAME = encode_message({"type": "RESYNC"})
+
+# Appends an event to the user's capped inbox stream and publishes it with its stream id in one round trip,
+# so live delivery and replay always agree on ids and order
+_APPEND_EVENT_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local frame = '{"id":"' .. id .. '",' .. string.sub(ARGV[2], 2)
+if ARGV[4] ~= '' then
+    redis.call('PUBLISH', ARGV[4], frame)
+end
+return frame
+"""
+
+
+def _with_event_id(event_id: str, data: str) -> str:
+    return f'{{"id":"{event_id}",{data[1:]}'
+
+
+def _event_id(frame: str) -> str | None:
+    if not frame.startswith('{"id":"'):
+        return None
+    return frame[7:frame.index('"', 7)]
+
+
+def _event_id_key(event_id: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in event_id.split("-"))
+
+
+class SocketConnection:
+    def __init__(self, websocket: WebSocket, queue_size: int, overflow_policy: str):
+        self.websocket = websocket
+        self.overflow_policy = overflow_policy
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.closed = False
+        # Holds live messages while missed events are being replayed
+        self.replay_buffer: list[str] | None = None
+        self.last_seen = time.monotonic()
+        self.writer = asyncio.create_task(self._drain())
+
+    def touch(self) -> None:
+        self.last_seen = time.monotonic()
+
+    def enqueue(self, data: str) -> None:
+        # Never awaits, so a slow client cannot hold up whoever is fanning the message out
+        if self.closed:
+            return
+        if self.replay_buffer is not None:
+            self.replay_buffer.append(data)
+            return
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.overflow_policy == OVERFLOW_DISCONNECT:
+                self.close()
+                asyncio.create_task(self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER))
+                return
+            self.queue.get_nowait()
+            self.queue.put_nowait(data)
+
+    def close(self) -> None:
+        self.closed = True
+        self.writer.cancel()
+
+    async def _drain(self) -> None:
+        try:
+            while True:
+                data = await self.queue.get()
+                await self.websocket.send_text(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The receive loop of a broken socket raises WebSocketDisconnect and removes the connection
+            pass
 
 
 class SocketConnectionManager:
-    def __init__(self):
-        self.connections: Dict[UUID, List[WebSocket]] = {}
+    def __init__(self, queue_size: int = socket_settings.SOCKET_SEND_QUEUE_SIZE,
+                 overflow_policy: str = socket_settings.SOCKET_OVERFLOW_POLICY,
+                 max_connections_per_user: int = socket_settings.SOCKET_MAX_CONNECTIONS_PER_USER,
+                 ping_interval: float = socket_settings.SOCKET_PING_INTERVAL,
+                 idle_timeout: float = socket_settings.SOCKET_IDLE_TIMEOUT,
+                 inbox_max_length: int = socket_settings.SOCKET_INBOX_MAX_LENGTH,
+                 inbox_ttl_seconds: int = socket_settings.SOCKET_INBOX_TTL_SECONDS,
+                 replay_limit: int = socket_settings.SOCKET_REPLAY_LIMIT):
+        self.connections: Dict[UUID, List[SocketConnection]] = {}
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.max_connections_per_user = max_connections_per_user
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.inbox_max_length = inbox_max_length
+        self.inbox_ttl_seconds = inbox_ttl_seconds
+        self.replay_limit = replay_limit
+        self.redis: aioredis.Redis | None = None
+        self.pubsub: PubSub | None = None
+        self.listener: asyncio.Task | None = None
+        self.keepalive: asyncio.Task | None = None
+        self.messages_sent = 0
+        self.messages_per_second = 0.0
+        self.reaped = 0
+        self.replayed = 0
+
+    async def start(self, redis: aioredis.Redis, distributed: bool) -> None:
+        self.keepalive = asyncio.create_task(self._keepalive())
+        self.redis = redis
+        if not distributed:
+            return
+        # Messages are published on per-user channels; each worker only subscribes for users connected to it
+        self.pubsub = redis.pubsub()
+        # A private channel keeps the subscription alive while no user is connected to this worker
+        await self.pubsub.subscribe(f"ws:worker:{uuid.uuid4()}")
+        self.listener = asyncio.create_task(self._listen())
 
-    async def connect(self, websocket: WebSocket, user_id: UUID):
+    async def stop(self) -> None:
+        if self.keepalive:
+            self.keepalive.cancel()
+        if self.listener:
+            self.listener.cancel()
+        if self.pubsub:
+            await self.pubsub.reset()
+        self.redis = self.pubsub = self.listener = self.keepalive = None
+
+    async def connect(self, websocket: WebSocket, user_id: UUID,
+                      last_event_id: str | None = None) -> SocketConnection:
         await websocket.accept()
         if user_id not in self.connections:
             self.connections[user_id] = []
-        self.connections[user_id].append(websocket)
+            if self.pubsub:
+                await self.pubsub.subscribe(USER_CHANNEL_PREFIX + str(user_id))
+        user_connections = self.connections[user_id]
+        # Forgotten tabs and leaked clients give way to the newest connection
+        while len(user_connections) >= self.max_connections_per_user:
+            self._close(user_connections.pop(0), status.WS_1008_POLICY_VIOLATION)
+        connection = SocketConnection(websocket, self.queue_size, self.overflow_policy)
+        user_connections.append(connection)
+        if last_event_id is not None and self.redis:
+            await self._replay(connection, user_id, last_event_id)
+        return connection
 
-    def disconnect(self, websocket: WebSocket, user_id: UUID):
+    async def disconnect(self, websocket: WebSocket, user_id: UUID):
         if user_id in self.connections:
-            if websocket in self.connections[user_id]:
-                self.connections[user_id].remove(websocket)
-        if not self.connections[user_id]:
+            for connection in self.connections[user_id]:
+                if connection.websocket is websocket:
+                    connection.close()
+                    self.connections[user_id].remove(connection)
+                    break
+            await self._forget_user_if_idle(user_id)
+
+    async def send_events(self, events: list[tuple[UUID, str]]) -> None:
+        # Events are kept in the user's inbox so a reconnecting client can resume from its last seen id
+        if self.redis is None:
+            for user_id, data in events:
+                self._deliver(user_id, data)
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, data in events:
+                pipe.eval(
+                    _APPEND_EVENT_SCRIPT,
+                    1,
+                    INBOX_PREFIX + str(user_id),
+                    self.inbox_max_length,
+                    data,
+                    self.inbox_ttl_seconds,
+                    USER_CHANNEL_PREFIX + str(user_id) if self.pubsub else "",
+                )
+            frames = await pipe.execute()
+        if not self.pubsub:
+            for (user_id, _), frame in zip(events, frames):
+                self._deliver(user_id, frame)
+
+    def stats(self) -> dict[str, Any]:
+        queue_depths = [connection.queue.qsize() for user in self.connections.values() for connection in user]
+        return {
+            "open_sockets": len(queue_depths),
+            "connected_users": len(self.connections),
+            "messages_sent": self.messages_sent,
+            "messages_per_second": self.messages_per_second,
+            "send_queue_depth": sum(queue_depths),
+            "max_send_queue_depth": max(queue_depths, default=0),
+            "reaped_sockets": self.reaped,
+            "replayed_events": self.replayed,
+        }
+
+    def _deliver(self, user_id: UUID, data: str) -> None:
+        for connection in self.connections.get(user_id, ()):
+            connection.enqueue(data)
+            self.messages_sent += 1
+
+    async def _replay(self, connection: SocketConnection, user_id: UUID, last_event_id: str) -> None:
+        connection.replay_buffer = []
+        inbox = INBOX_PREFIX + str(user_id)
+        try:
+            last_seen = _event_id_key(last_event_id)
+            # The oldest kept entry tells whether MAXLEN or the TTL already dropped events the client has not seen
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.xrange(inbox, min="-", max="+", count=1)
+                pipe.xrange(inbox, min="(" + last_event_id, max="+", count=self.replay_limit + 1)
+                oldest, entries = await pipe.execute()
+        except (RedisError, ValueError):
+            oldest, entries = [], None
+        buffered, connection.replay_buffer = connection.replay_buffer, None
+
+        if (entries is None or not oldest or last_seen < _event_id_key(oldest[0][0])
+                or len(entries) > self.replay_limit):
+            # Unknown, expired or trimmed id, or too far behind: the client has to reload instead of replaying
+            connection.enqueue(RESYNC_FRAME)
+            for frame in buffered:
+                connection.enqueue(frame)
+            return
+
+        for event_id, fields in entries:
+            connection.enqueue(_with_event_id(event_id, fields["data"]))
+        self.replayed += len(entries)
+
+        # Live events that arrived during the read may already be part of the replay
+        replayed_ids = {event_id for event_id, _ in entries}
+        for frame in buffered:
+            event_id = _event_id(frame)
+            if event_id is None or (event_id not in replayed_ids and _event_id_key(event_id) > last_seen):
+                connection.enqueue(frame)
+
+    def _close(self, connection: SocketConnection, code: int) -> None:
+        connection.close()
+        asyncio.create_task(connection.websocket.close(code=code))
+
+    async def _forget_user_if_idle(self, user_id: UUID) -> None:
+        if user_id in self.connections and not self.connections[user_id]:
             del self.connections[user_id]
+            if self.pubsub:
+                await self.pubsub.unsubscribe(USER_CHANNEL_PREFIX + str(user_id))
+
+    async def _keepalive(self) -> None:
+        last_tick, last_sent = time.monotonic(), self.messages_sent
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            now = time.monotonic()
+            self.messages_per_second = (self.messages_sent - last_sent) / (now - last_tick)
+            last_tick, last_sent = now, self.messages_sent
+
+            for user_id, user_connections in list(self.connections.items()):
+                for connection in list(user_connections):
+                    idle = now - connection.last_seen
+                    if idle >= self.idle_timeout:
+                        user_connections.remove(connection)
+                        self._close(connection, status.WS_1001_GOING_AWAY)
+                        self.reaped += 1
+                    elif idle >= self.ping_interval:
+                        connection.enqueue(PING_FRAME)
+                await self._forget_user_if_idle(user_id)
 
-    async def send_message(self, user_id: UUID, message: dict):
-        if self.connections.get(user_id):
-            for websocket in self.connections[user_id]:
-                await websocket.send_json(message)
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message["type"] == "message" and message["channel"].startswith(USER_CHANNEL_PREFIX):
+                        user_id = UUID(message["channel"].removeprefix(USER_CHANNEL_PREFIX))
+                        self._deliver(user_id, message["data"])
+            except RedisError:
+                # PubSub re-subscribes to its channels when the connection is re-established
+                await asyncio.sleep(1)
 
-socket_manager = SocketConnectionManager()
\ No newline at end of file
+socket_manager = SocketConnectionManager()
+metrics.register("websockets", socket_manager.stats)
@@ -13,6 +13,9 @@ from .errors import ErrorCode
 
 _serializer = URLSafeTimedSerializer(security_settings.JWT_SECRET)
 
+# Bump when the claims embedded in access tokens change shape
+ACCESS_TOKEN_VERSION = 1
+
 def generate_access_token(
         data: dict,
         expiry: timedelta = timedelta(minutes=15),
@@ -21,6 +24,7 @@ def generate_access_token(
     return jwt.encode(
         payload={
             **data,
+            "ver": ACCESS_TOKEN_VERSION,
             "jti": jti,
             "exp": datetime.now(timezone.utc) + expiry
         },